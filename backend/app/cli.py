@@ -0,0 +1,159 @@
+import argparse
+import gzip
+import sys
+from contextlib import contextmanager
+from sqlalchemy import select
+from app.database import SessionLocal, engine
+from app.migrations import run_migrations
+from app.models.code_repository import CodeRepository
+from app.models.user import User
+from app.services.authentication.jwt_handler import verify_token
+from app.services.authentication.principal_cache import Principal
+from app.services.authentication.revocation import add_revocation
+from app.services.storage.archive import FORMATS, import_archive, iter_export
+from app.services.storage.chunk_store import CHUNK_GC_GRACE, collect_garbage, manifest_digests
+from app.utils.executors import shutdown_pools
+
+# Maintenance commands, run from backend/: python -m app.cli <command> --help
+
+def _principal(username: str) -> Principal:
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == username).first()
+        if not user:
+            sys.exit(f"User not found: {username}")
+        return Principal.from_user(user)
+
+def _format_for(path: str, requested: str) -> str:
+    if requested:
+        return requested
+    return "tar" if path.endswith((".tar", ".tar.gz", ".tgz")) else "ndjson"
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == "-":
+        yield sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+    else:
+        opener = gzip.open if path.endswith((".gz", ".tgz")) else open
+        with opener(path, mode) as f:
+            yield f
+
+def cmd_migrate(args):
+    run_migrations(engine)
+    print("Database is up to date", file=sys.stderr)
+    return 0
+
+def cmd_serve(args):
+    from app.server import serve
+    if not args.skip_migrate:
+        run_migrations(engine)
+        engine.dispose() # Workers are forked; they must not inherit these connections
+    serve(args.workers, args.bind)
+    return 0
+
+def cmd_import(args):
+    principal = _principal(args.user)
+    with _open(args.path, "rb") as f:
+        report = import_archive(f, _format_for(args.path, args.format), principal, args.batch_size)
+    for error in report["errors"]:
+        print(f"record {error['record']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {report['imported']}, rejected {report['rejected']}", file=sys.stderr)
+    return 1 if report["rejected"] else 0
+
+def cmd_export(args):
+    principal = _principal(args.user)
+    with _open(args.path, "wb") as f:
+        for data in iter_export(principal, _format_for(args.path, args.format)):
+            f.write(data)
+    return 0
+
+def cmd_train_dictionary(args):
+    from app.services.storage.chunk_store import train_dictionary
+    dict_id = train_dictionary(args.path, args.size)
+    print(f"Wrote zstd dictionary {dict_id} to {args.path}; set CHUNK_ZSTD_DICT to use it", file=sys.stderr)
+    return 0
+
+def cmd_gc_chunks(args):
+    with SessionLocal() as db:
+        manifests = db.execute(
+            select(CodeRepository.content_manifest)
+            .where(CodeRepository.content_manifest.is_not(None))
+            .execution_options(yield_per=500)
+        ).scalars()
+        live = {digest for manifest in manifests for digest in manifest_digests(manifest)}
+    removed = collect_garbage(live, args.grace)
+    print(f"Deleted {removed} unreferenced chunk files, {len(live)} chunks in use", file=sys.stderr)
+    return 0
+
+def cmd_revoke_token(args):
+    claims = verify_token(args.token, SystemExit("Invalid or expired token"))
+    if "jti" not in claims:
+        sys.exit("Token has no jti and cannot be revoked; it lapses at its exp")
+    with SessionLocal() as db:
+        add_revocation(db, claims["jti"], claims["exp"])
+        db.commit()
+    print(f"Revoked token {claims['jti']} of {claims['sub']}; workers refuse it within seconds", file=sys.stderr)
+    return 0
+
+def cmd_import_report(args):
+    from app.utils.profiler import import_report, import_times
+    rows = import_times(args.module)
+    sys.stdout.write(import_report(rows, args.top))
+    total_ms = sum(own for _, own, _, _ in rows) * 1000
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"Import time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="DevVault maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Create the schema or bring an existing database up to date")
+    migrate.set_defaults(func=cmd_migrate)
+
+    server = commands.add_parser("serve", help="Run the production server: preloaded app, one uvicorn worker per core")
+    server.add_argument("--workers", type=int, help="Default: WEB_CONCURRENCY or the CPU count")
+    server.add_argument("--bind", help="Default: BIND or 0.0.0.0:8000")
+    server.add_argument("--skip-migrate", action="store_true", help="Migrations already ran as a separate deploy step")
+    server.set_defaults(func=cmd_serve)
+
+    importer = commands.add_parser("import", help="Bulk import repositories from an NDJSON or tar archive")
+    importer.add_argument("path", help="Archive file, or - for stdin")
+    importer.add_argument("--user", required=True, help="Owner of the imported repositories; BLP checks use their clearance")
+    importer.add_argument("--format", choices=FORMATS, help="Default: from the file extension")
+    importer.add_argument("--batch-size", type=int, help="Repositories per transaction")
+    importer.set_defaults(func=cmd_import)
+
+    exporter = commands.add_parser("export", help="Export the repositories a user can read")
+    exporter.add_argument("path", help="Output file, or - for stdout")
+    exporter.add_argument("--user", required=True)
+    exporter.add_argument("--format", choices=FORMATS)
+    exporter.set_defaults(func=cmd_export)
+
+    trainer = commands.add_parser("train-dictionary", help="Train a zstd dictionary on stored chunks")
+    trainer.add_argument("path", help="Dictionary file to write")
+    trainer.add_argument("--size", type=int, default=112640, help="Dictionary size in bytes")
+    trainer.set_defaults(func=cmd_train_dictionary)
+
+    collector = commands.add_parser("gc-chunks", help="Delete stored chunks no repository references any more")
+    collector.add_argument("--grace", type=float, default=CHUNK_GC_GRACE, help="Keep chunks written or reused within this many seconds")
+    collector.set_defaults(func=cmd_gc_chunks)
+
+    revoker = commands.add_parser("revoke-token", help="Revoke a leaked or compromised access token")
+    revoker.add_argument("token", help="The encoded JWT")
+    revoker.set_defaults(func=cmd_revoke_token)
+
+    report = commands.add_parser("import-report", help="Per-module import cost of the API, in a fresh interpreter")
+    report.add_argument("--module", default="app.main", help="Module to import")
+    report.add_argument("--top", type=int, default=20, help="Rows per section")
+    report.add_argument("--budget-ms", type=float, help="Exit 1 if the total import time is over this")
+    report.set_defaults(func=cmd_import_report)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        shutdown_pools()
+
+if __name__ == "__main__":
+    sys.exit(main())
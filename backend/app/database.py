@@ -1,13 +1,78 @@
-from sqlalchemy import create_engine
+from decouple import config
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import time
+from app.utils.metrics import registry
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./devvault.db"
+SQLALCHEMY_DATABASE_URL = config("DATABASE_URL", default="sqlite:///./devvault.db")
+
+def _async_url(url: str) -> str:
+    # Same database, async driver: aiosqlite locally, asyncpg for Postgres
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+ASYNC_DATABASE_URL = config("ASYNC_DATABASE_URL", default=_async_url(SQLALCHEMY_DATABASE_URL))
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=10, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=20, cast=int)
+
+_is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
 )
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside a writer instead of queueing behind it
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL") # Durable at checkpoints, safe with WAL
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000") # ~20 MB page cache per connection
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+if _is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+QUERY_METRIC = "devvault_db_query_seconds"
+registry.describe(QUERY_METRIC, "Database statement execution time by statement type")
+
+# The start time lives on the execution context, which is dropped with the
+# statement whether it succeeds or fails. Statements run without a context
+# (a few internal ones) are not timed.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    registry.observe(QUERY_METRIC, elapsed, operation=operation)
+
+for _sync_engine in (engine, async_engine.sync_engine):
+    event.listen(_sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_sync_engine, "after_cursor_execute", _after_cursor_execute)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -17,3 +82,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
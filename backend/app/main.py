@@ -1,12 +1,43 @@
+from contextlib import asynccontextmanager
+from decouple import config
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routes import auth_routes, code_routes, crypto_routes, utils_routes
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.timing import TimingMiddleware
+from app.routes import auth_routes, code_routes, crypto_routes, utils_routes, version_routes
+from app.services.authentication.mfa_service import qr_cache_stats
+from app.services.authentication.password_auth import password_pool_stats
+from app.services.authentication.principal_cache import principal_cache_stats
+from app.services.authentication.revocation import revocations
+from app.services.cryptography.key_cache import key_cache_stats
+from app.services.cryptography.key_pool import key_pool
+from app.utils.executors import shutdown_pools
+from app.utils.lazy import warm_up
+from app.utils.metrics import registry
+from app.utils.responses import ORJSONResponse
 
-# Create DB tables
-Base.metadata.create_all(bind=engine)
+# The schema is created and upgraded by `python -m app.cli migrate`, once per
+# deploy (run.py does it before starting the dev server), not on every import
 
-app = FastAPI(title="DevVault API", description="Secure Code Collaboration Platform")
+# Crypto, QR and JWT modules load on first use. Set this to load them before
+# the first request instead, trading startup time for first-request latency.
+WARMUP_ON_STARTUP = config("WARMUP_ON_STARTUP", default=False, cast=bool)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        await run_in_threadpool(warm_up)
+    await revocations.start()
+    key_pool.start()
+    yield
+    key_pool.stop()
+    revocations.stop()
+    shutdown_pools()
+
+app = FastAPI(title="DevVault API", description="Secure Code Collaboration Platform", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # CORS
 origins = [
@@ -20,13 +51,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(CompressionMiddleware)
+# Outermost, so the recorded latency includes CORS, compression and exception handling
+app.add_middleware(TimingMiddleware)
+
+registry.register_stats("devvault_key_cache", key_cache_stats)
+registry.register_stats("devvault_key_pool", key_pool.stats)
+registry.register_stats("devvault_principal_cache", principal_cache_stats)
+registry.register_stats("devvault_password_pool", password_pool_stats)
+registry.register_stats("devvault_qr_cache", qr_cache_stats)
+registry.register_stats("devvault_revocations", revocations.stats)
+
 app.include_router(auth_routes.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(code_routes.router, prefix="/api/code", tags=["Code Repository"])
+app.include_router(version_routes.router, prefix="/api/code", tags=["Code Repository"])
 app.include_router(crypto_routes.router, prefix="/api/crypto", tags=["Cryptography"])
 app.include_router(utils_routes.router, prefix="/api/utils", tags=["Utils"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to DevVault Secure API"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
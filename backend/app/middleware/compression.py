@@ -0,0 +1,135 @@
+import zlib
+import zstandard
+from decouple import config
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+# Bodies below COMPRESSION_MIN_SIZE go out as they are; framing overhead and
+# CPU outweigh the saving. Streamed bodies are always compressed, flushed per
+# message so NDJSON rows still arrive as they are produced.
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", default=1024, cast=int)
+GZIP_LEVEL = config("GZIP_LEVEL", default=6, cast=int)
+ZSTD_LEVEL = config("ZSTD_LEVEL", default=3, cast=int)
+# Larger single bodies are compressed off the event loop
+THREADPOOL_THRESHOLD = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+def choose_encoding(accept_encoding: str):
+    """Best of zstd/gzip by q-value, zstd on ties; None if neither is acceptable."""
+    best, best_q = None, 0.0
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding in ("zstd", "gzip") and (q > best_q or (q == best_q and coding == "zstd")):
+            best, best_q = coding, q
+    return best
+
+class _Gzip:
+    def __init__(self):
+        self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+_CODECS = {"gzip": _Gzip, "zstd": _Zstd}
+
+def _compress_whole(coding: str, body: bytes) -> bytes:
+    codec = _CODECS[coding]()
+    return codec.compress(body) + codec.finish()
+
+class CompressionMiddleware:
+    """
+    Pure ASGI response compression negotiated from Accept-Encoding (zstd or
+    gzip). Skips responses that are already encoded, not a compressible
+    type (ciphertext streams are application/octet-stream), or too small.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        codec = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, codec, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message # Held until the first body message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if codec is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    # Whole body in one message: compress it at once, or not at all
+                    if len(body) < COMPRESSION_MIN_SIZE:
+                        passthrough = True
+                        await send(start_message)
+                        await send(message)
+                        return
+                    if len(body) >= THREADPOOL_THRESHOLD:
+                        body = await run_in_threadpool(_compress_whole, coding, body)
+                    else:
+                        body = _compress_whole(coding, body)
+                    headers["Content-Encoding"] = coding
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                headers["Content-Encoding"] = coding
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                codec = _CODECS[coding]()
+                await send(start_message)
+
+            data = codec.compress(body) if body else b""
+            if not more_body:
+                data += codec.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
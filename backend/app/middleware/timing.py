@@ -0,0 +1,69 @@
+import logging
+import time
+from decouple import config
+from starlette.concurrency import run_in_threadpool
+from app.utils.metrics import registry
+from app.utils.profiler import StackSampler, dump_collapsed
+
+logger = logging.getLogger(__name__)
+
+REQUEST_METRIC = "devvault_http_request_seconds"
+registry.describe(REQUEST_METRIC, "HTTP request latency by route template")
+
+# Opt-in profiling: when PROFILE_SLOW_MS is set, requests are stack-sampled
+# and any that take longer than the threshold get a collapsed-stack file in
+# PROFILE_DIR. Sampling costs a thread per request, so keep it off normally.
+PROFILE_SLOW_MS = config("PROFILE_SLOW_MS", default=0, cast=int)
+PROFILE_INTERVAL_MS = config("PROFILE_INTERVAL_MS", default=5, cast=float)
+PROFILE_DIR = config("PROFILE_DIR", default="./profiles")
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Depending on the FastAPI version, routes from an included router report
+    # either the full path or the router-local one; restore the static prefix.
+    template = route.path
+    depth = len([part for part in template.split("/") if part])
+    parts = [part for part in scope["path"].split("/") if part]
+    prefix = parts[:len(parts) - depth]
+    return ("/" + "/".join(prefix) if prefix else "") + template
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template (not
+    raw path, so /api/code/1 and /api/code/2 share a series). The time runs
+    until the response body has been sent, including streamed bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        sampler = None
+        if PROFILE_SLOW_MS > 0:
+            sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            path = route_template(scope)
+            registry.observe(REQUEST_METRIC, elapsed, method=scope["method"], route=path, status=str(status))
+            if sampler is not None:
+                sampler.stop() # Fast requests just let the thread exit
+                if elapsed * 1000 >= PROFILE_SLOW_MS:
+                    dumped = await run_in_threadpool(dump_collapsed, PROFILE_DIR, f"{scope['method']} {path}", sampler)
+                    logger.warning("Slow request %s %s took %.0f ms, profile in %s", scope["method"], path, elapsed * 1000, dumped)
@@ -0,0 +1,129 @@
+from sqlalchemy import bindparam, inspect, text, case, select, column
+from app.database import Base
+from app.models import user, code_repository, repository_version, revoked_token  # noqa: F401 - register tables on Base
+from app.models.code_repository import CodeRepository
+from app.models.repository_version import RepositoryVersion
+from app.services.authorization.bell_lapadula import LEVEL_HIERARCHY
+from app.services.storage.chunk_store import write_content, read_content, content_tree, manifest_size
+from app.services.storage.version_store import make_snapshot
+from app.services.search.code_index import CREATE_INDEX_SQL, UPSERT_SQL, INDEX_TABLE, index_params
+
+def _add_missing_columns(conn):
+    # create_all never alters existing tables, so columns added to a model
+    # after the table was first created have to be added here.
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'
+            if column.server_default is not None:
+                # The default fills existing rows, which NOT NULL needs
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+
+def _create_missing_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def _backfill_classification_rank(conn):
+    rank = case(
+        {level.value: value for level, value in LEVEL_HIERARCHY.items()},
+        value=CodeRepository.classification,
+        else_=0,
+    )
+    conn.execute(
+        CodeRepository.__table__.update()
+        .where(CodeRepository.classification_rank.is_(None))
+        .values(classification_rank=rank)
+    )
+
+MOVE_BATCH_SIZE = 200
+
+def _move_inline_content(engine):
+    # Only ids are loaded up front. Contents are streamed a batch at a time and
+    # each batch commits, so a large database is never held in memory and an
+    # interrupted run resumes with the rows still left.
+    table = CodeRepository.__table__
+    pending = (table.c.content.is_not(None), table.c.content_manifest.is_(None))
+    with engine.connect() as conn:
+        ids = conn.execute(select(table.c.id).where(*pending).order_by(table.c.id)).scalars().all()
+    move = table.update().where(table.c.id == bindparam("repo_id")).values(content_manifest=bindparam("manifest"), content=None)
+    for start in range(0, len(ids), MOVE_BATCH_SIZE):
+        with engine.begin() as conn:
+            rows = conn.execution_options(stream_results=True, yield_per=50).execute(
+                select(table.c.id, table.c.content).where(table.c.id.in_(ids[start:start + MOVE_BATCH_SIZE]), *pending)
+            )
+            moved = [{"repo_id": repo_id, "manifest": write_content(content)} for repo_id, content in rows]
+            if moved:
+                conn.execute(move, moved)
+
+def _backfill_integrity_root(conn):
+    table = CodeRepository.__table__
+    rows = conn.execute(
+        table.select()
+        .with_only_columns(table.c.id, table.c.content_manifest)
+        .where(table.c.content_manifest.is_not(None), table.c.integrity_tree.is_(None))
+    ).all()
+    for repo_id, manifest in rows:
+        tree = content_tree(manifest)
+        conn.execute(
+            table.update()
+            .where(table.c.id == repo_id)
+            .values(integrity_root=tree.root_hex(), integrity_tree=tree.to_bytes())
+        )
+
+def _backfill_initial_versions(conn):
+    # Repositories created before version history get their current content as version 1
+    table = CodeRepository.__table__
+    versions = RepositoryVersion.__table__
+    rows = conn.execute(
+        table.select()
+        .with_only_columns(table.c.id, table.c.content_manifest, table.c.integrity_root, table.c.owner_id)
+        .where(table.c.head_version.is_(None))
+    ).all()
+    for repo_id, manifest, integrity_root, owner_id in rows:
+        content = read_content(manifest)
+        conn.execute(versions.insert().values(
+            repo_id=repo_id,
+            version=1,
+            is_snapshot=True,
+            data=make_snapshot(content),
+            size=manifest_size(manifest) if manifest else 0,
+            integrity_root=integrity_root,
+            author_id=owner_id,
+        ))
+        conn.execute(table.update().where(table.c.id == repo_id).values(head_version=1))
+
+def _build_search_index(conn):
+    # FTS5 is SQLite-only; other databases run without /api/code/search
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(CREATE_INDEX_SQL)
+    table = CodeRepository.__table__
+    rows = conn.execute(
+        table.select()
+        .with_only_columns(table.c.id, table.c.name, table.c.description, table.c.content_manifest, table.c.classification_rank)
+        .where(table.c.id.not_in(select(column("rowid")).select_from(text(INDEX_TABLE))))
+    ).all()
+    for repo_id, name, description, manifest, rank in rows:
+        conn.execute(UPSERT_SQL, index_params(repo_id, name, description, read_content(manifest), rank))
+
+def run_migrations(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
+        _create_missing_indexes(conn)
+        _backfill_classification_rank(conn)
+    _move_inline_content(engine) # Commits per batch, outside the main transaction
+    with engine.begin() as conn:
+        _backfill_integrity_root(conn)
+        _backfill_initial_versions(conn)
+        _build_search_index(conn)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -9,9 +9,15 @@ class CodeRepository(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String)
-    classification = Column(String) # Unclassified, Confidential, Secret, Top Secret
+    classification = Column(String, index=True) # Unclassified, Confidential, Secret, Top Secret
+    classification_rank = Column(Integer, index=True, default=0) # LEVEL_HIERARCHY value, used for BLP checks in SQL
+    compartments = Column(Integer, nullable=False, default=0, server_default="0") # Bitmask over SECURITY_COMPARTMENTS
     owner_id = Column(Integer, ForeignKey("users.id"))
-    content = Column(Text) # Storing code content directly for simplicity
+    content_manifest = Column(Text) # Chunk manifest, the content itself lives in the chunk store
+    integrity_root = Column(String) # Merkle root over the manifest's chunk digests
+    integrity_tree = Column(LargeBinary) # Serialized levels of that tree, updated in place on writes
+    head_version = Column(Integer, default=1) # Latest entry in repository_versions
+    content = Column(Text) # Legacy inline content, moved to the chunk store by migrations
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
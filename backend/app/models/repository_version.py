@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Boolean, LargeBinary, ForeignKey, DateTime, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+class RepositoryVersion(Base):
+    __tablename__ = "repository_versions"
+    __table_args__ = (UniqueConstraint("repo_id", "version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    repo_id = Column(Integer, ForeignKey("code_repositories.id"), index=True)
+    version = Column(Integer)
+    parent_version = Column(Integer, nullable=True)
+    is_snapshot = Column(Boolean, default=False) # Full compressed content instead of a delta
+    data = Column(LargeBinary) # zlib-compressed snapshot text or line delta against parent_version
+    size = Column(Integer) # Size of the materialized content in bytes
+    integrity_root = Column(String)
+    author_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
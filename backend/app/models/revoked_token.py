@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.database import Base
+from datetime import datetime
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True, index=True)
+    expires_at = Column(Integer, index=True) # Token exp, seconds since epoch; the row is useless after it
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True) # Workers poll on it
@@ -17,6 +17,7 @@ class User(Base):
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
     clearance_level = Column(String, default=ClearanceLevel.UNCLASSIFIED)
+    compartments = Column(Integer, nullable=False, default=0, server_default="0") # Bitmask over SECURITY_COMPARTMENTS
     mfa_secret = Column(String, nullable=True)
     mfa_enabled = Column(Boolean, default=False)
     role = Column(String, default="Developer") # Developer, Admin, Architect
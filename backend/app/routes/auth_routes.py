@@ -1,83 +1,161 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+import math
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User, ClearanceLevel
+from app.services.authorization.policy import ALL_COMPARTMENTS
+from app.routes.code_routes import get_current_user, oauth2_scheme
 from app.schemas import UserCreate, UserLogin, Token, MFAVerify, MFASetupResponse
-from app.services.authentication.password_auth import get_password_hash, verify_password
-from app.services.authentication.jwt_handler import create_access_token
-from app.services.authentication.mfa_service import generate_mfa_secret, get_totp_uri, generate_qr_code_base64, verify_totp
+from app.services.authentication.password_auth import (
+    get_password_hash_async, verify_password_async, needs_rehash, PasswordWorkersBusy,
+)
+from app.services.authentication.jwt_handler import create_access_token, verify_token
+from app.services.authentication.principal_cache import Principal, invalidate_user
+from app.services.authentication.revocation import revoke_token
+from app.services.authentication.mfa_service import generate_mfa_secret, get_totp_uri, render_qr_async, verify_totp_step
+from app.services.authentication.throttle import claim_otp, login_by_address, login_by_user, otp_attempts
 
 router = APIRouter()
 
+async def _get_user(db: AsyncSession, username: str):
+    return (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+
+def _workers_busy():
+    return HTTPException(status_code=503, detail="Authentication service busy, retry shortly", headers={"Retry-After": "1"})
+
+def _too_many_attempts(wait: float):
+    return HTTPException(status_code=429, detail="Too many attempts, retry later", headers={"Retry-After": str(math.ceil(wait))})
+
+async def _check_otp(username: str, secret: str, token: str) -> bool:
+    # Throttled before the check, and a code's time step is spent on first use
+    wait = await otp_attempts.hit(username)
+    if wait:
+        raise _too_many_attempts(wait)
+    step = verify_totp_step(secret, token)
+    return step is not None and await claim_otp(username, step)
+
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await _get_user(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordWorkersBusy:
+        raise _workers_busy()
     
     # Assign clearance based on role
     clearance = ClearanceLevel.UNCLASSIFIED
+    compartments = 0
     if user.role == "Admin":
         clearance = ClearanceLevel.TOP_SECRET
+        compartments = ALL_COMPARTMENTS
         
     new_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password,
         role=user.role,
-        clearance_level=clearance
+        clearance_level=clearance,
+        compartments=compartments
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     access_token = create_access_token(data={"sub": new_user.username, "role": new_user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login")
-def login(user: UserLogin, mfa_token: str = None, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login(user: UserLogin, request: Request, mfa_token: str = None, db: AsyncSession = Depends(get_async_db)):
+    # Counted before any DB or bcrypt work, so throttled guesses cost us nothing
+    address = request.client.host if request.client else "unknown"
+    wait = max(await login_by_user.hit(user.username), await login_by_address.hit(address))
+    if wait:
+        raise _too_many_attempts(wait)
+
+    db_user = await _get_user(db, user.username)
+    try:
+        if not db_user or not await verify_password_async(user.password, db_user.hashed_password):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+    except PasswordWorkersBusy:
+        raise _workers_busy()
     
     if db_user.mfa_enabled:
         if not mfa_token:
             raise HTTPException(status_code=403, detail="MFA token required")
-        if not verify_totp(db_user.mfa_secret, mfa_token):
+        if not await _check_otp(db_user.username, db_user.mfa_secret, mfa_token):
              raise HTTPException(status_code=401, detail="Invalid MFA token")
 
+    # Work factor changed since this hash was made: upgrade it while we have the password
+    if needs_rehash(db_user.hashed_password):
+        try:
+            db_user.hashed_password = await get_password_hash_async(user.password)
+            await db.commit()
+        except PasswordWorkersBusy:
+            pass # Try again on the next login
+
+    # Only failed attempts count against the budgets
+    await login_by_user.refund(user.username)
+    await login_by_address.refund(address)
+
     access_token = create_access_token(data={"sub": db_user.username, "role": db_user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    claims = verify_token(token, HTTPException(status_code=401, detail="Invalid token"))
+    if "jti" not in claims:
+        # Issued before tokens carried an id; it lapses at its exp
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+    await revoke_token(db, claims["jti"], claims["exp"])
+    return {"message": "Logged out"}
+
+QRFormat = Literal["png", "svg", "matrix"]
+
 @router.post("/mfa/setup", response_model=MFASetupResponse)
-def setup_mfa(username: str, db: Session = Depends(get_db)):
-    # In real app, verify current user via token. For simplicity passing username.
-    # TODO: Add dependency for current user
-    user = db.query(User).filter(User.username == username).first()
+async def setup_mfa(
+    username: str,
+    qr_format: QRFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Only the account holder may see or replace their secret
+    if principal.username != username:
+        raise HTTPException(status_code=403, detail="Cannot set up MFA for another user")
+    user = await _get_user(db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    secret = generate_mfa_secret()
+    # A retry by the same user before MFA is enabled keeps the pending
+    # secret: a code already scanned stays valid and the QR comes from the cache
+    if user.mfa_secret and not user.mfa_enabled:
+        secret = user.mfa_secret
+    else:
+        # Don't save secret yet, save on verify? Or save now but not enabled.
+        secret = generate_mfa_secret()
+        user.mfa_secret = secret
+        await db.commit()
+        invalidate_user(user.username)
+
     uri = get_totp_uri(secret, user.username)
-    qr = generate_qr_code_base64(uri)
-    
-    # Don't save secret yet, save on verify? Or save now but not enabled.
-    user.mfa_secret = secret
-    db.commit()
-    
-    return {"secret": secret, "uri": uri, "qr_code": qr}
+    qr = await render_qr_async(uri, qr_format)
+    if qr_format == "matrix":
+        return {"secret": secret, "uri": uri, "qr_format": qr_format, "qr_matrix": qr}
+    return {"secret": secret, "uri": uri, "qr_format": qr_format, "qr_code": qr}
 
 @router.post("/mfa/enable")
-def enable_mfa(data: MFAVerify, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == data.username).first()
+async def enable_mfa(data: MFAVerify, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user(db, data.username)
     if not user:
          raise HTTPException(status_code=404, detail="User not found")
     
-    if not verify_totp(user.mfa_secret, data.token):
+    if not await _check_otp(user.username, user.mfa_secret, data.token):
         raise HTTPException(status_code=400, detail="Invalid OTP")
     
     user.mfa_enabled = True
-    db.commit()
+    await db.commit()
+    invalidate_user(user.username)
     return {"message": "MFA enabled successfully"}
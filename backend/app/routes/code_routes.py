@@ -1,87 +1,327 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, null, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+import io
+import orjson
+from app.database import AsyncSessionLocal, get_async_db
 from app.models.code_repository import CodeRepository
+from app.models.repository_version import RepositoryVersion
 from app.models.user import User
 from app.services.authentication.jwt_handler import verify_token
-from app.services.authorization.bell_lapadula import can_read, can_write
-from pydantic import BaseModel
+from app.services.authentication.principal_cache import Principal, get_cached_principal, cache_principal
+from app.services.authentication.revocation import revocations
+from app.services.authorization.bell_lapadula import clearance_rank
+from app.services.authorization.policy import compartment_mask, compartment_names
+from app.services.storage.chunk_store import write_content, read_content, iter_chunks, update_content_tree, manifest_size
+from app.services.search.code_index import UPSERT_SQL, SEARCH_SQL, index_params, match_expression
+from app.services.storage.version_store import is_snapshot_version, make_snapshot, make_delta, remember_version
+from app.services.storage.archive import import_archive, iter_export
+from app.utils.responses import ORJSONResponse
+from app.utils.streams import RequestBodyReader
+from pydantic import BaseModel, TypeAdapter
 from fastapi.security import OAuth2PasswordBearer
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+REDACTED_CONTENT = "[REDACTED: INSUFFICIENT CLEARANCE]"
+
 class RepoCreate(BaseModel):
     name: str
     description: str
     classification: str
     content: str
+    compartments: List[str] = []
+
+class RepoUpdate(BaseModel):
+    content: str
+    description: Optional[str] = None
 
 class RepoResponse(BaseModel):
     id: int
     name: str
     description: str
     classification: str
+    compartments: List[str] = []
     owner: str
     content: str
+    integrity_root: Optional[str] = None
+    head_version: Optional[int] = None
     can_read: bool
     can_write: bool
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = verify_token(token, HTTPException(status_code=401, detail="Invalid token"))
-    user = db.query(User).filter(User.username == payload.get("sub")).first()
+# Built once: validation and JSON encoding run in pydantic-core, and the
+# returned Response skips FastAPI's own serialization of the endpoint result
+_repo_response = TypeAdapter(RepoResponse)
+
+def _repo_json(fields: dict) -> Response:
+    return Response(_repo_response.dump_json(_repo_response.validate_python(fields)), media_type="application/json")
+
+# Rows per threadpool hop when streaming NDJSON
+STREAM_BATCH_SIZE = 100
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    cached = get_cached_principal(token)
+    payload = cached[0] if cached else verify_token(token, HTTPException(status_code=401, detail="Invalid token"))
+    # Checked on cache hits too: a cached principal may outlive a logout
+    if revocations.is_revoked(payload.get("jti")):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    if cached:
+        return cached[1]
+
+    user = (await db.execute(select(User).where(User.username == payload.get("sub")))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+    principal = Principal.from_user(user)
+    cache_principal(token, payload, principal)
+    return principal
 
 @router.post("/", response_model=RepoResponse)
-def create_repo(repo: RepoCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_repo(repo: RepoCreate, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # Create is a "Write". User can only create objects at their level or higher?
     # Usually users create objects at their own level.
     # Strict BLP: Write Up allowed.
-    if not can_write(user.clearance_level, repo.classification):
+    try:
+        compartments = compartment_mask(repo.compartments)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not user.policy.can_write(clearance_rank(repo.classification), compartments):
          raise HTTPException(status_code=403, detail="Security Violation: No Write Down (You cannot create a document with lower classification than your clearance)")
 
+    manifest, tree, version_data = await run_in_threadpool(_prepare_revision, None, None, repo.content, 1)
     new_repo = CodeRepository(
         name=repo.name,
         description=repo.description,
         classification=repo.classification,
-        content=repo.content,
+        classification_rank=clearance_rank(repo.classification),
+        compartments=compartments,
+        content_manifest=manifest,
+        integrity_root=tree.root_hex(),
+        integrity_tree=tree.to_bytes(),
+        head_version=1,
         owner_id=user.id
     )
     db.add(new_repo)
-    db.commit()
-    db.refresh(new_repo)
-    
-    return {
+    await db.flush()
+    db.add(_version_row(new_repo, 1, version_data, user.id))
+    await _index_repository(db, new_repo, repo.content)
+    await db.commit()
+    remember_version(new_repo.id, 1, repo.content)
+
+    return _repo_json({
         "id": new_repo.id,
         "name": new_repo.name,
         "description": new_repo.description,
         "classification": new_repo.classification,
+        "compartments": compartment_names(compartments),
         "owner": user.username,
-        "content": new_repo.content,
+        "content": repo.content,
+        "integrity_root": new_repo.integrity_root,
+        "head_version": 1,
         "can_read": True,
         "can_write": True
-    }
+    })
+
+def _search_enabled(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "sqlite"
+
+async def _index_repository(db: AsyncSession, repo: CodeRepository, content: str):
+    # Same transaction as the write, so the index never sees uncommitted content
+    if _search_enabled(db):
+        await db.execute(UPSERT_SQL, index_params(repo.id, repo.name, repo.description, content, repo.classification_rank))
+
+def _prepare_revision(old_manifest, old_tree, content: str, version: int):
+    # Blocking work for a new revision: chunk writes, hashing and the delta.
+    # The integrity tree is updated from the previous revision's, not rebuilt.
+    manifest = write_content(content)
+    if is_snapshot_version(version):
+        version_data = make_snapshot(content)
+    else:
+        version_data = make_delta(read_content(old_manifest), content)
+    return manifest, update_content_tree(old_tree, old_manifest, manifest), version_data
+
+def _version_row(repo: CodeRepository, version: int, data: bytes, author_id: int):
+    return RepositoryVersion(
+        repo_id=repo.id,
+        version=version,
+        parent_version=version - 1 if version > 1 else None,
+        is_snapshot=is_snapshot_version(version),
+        data=data,
+        size=manifest_size(repo.content_manifest),
+        integrity_root=repo.integrity_root,
+        author_id=author_id,
+    )
+
+@router.put("/{repo_id}", response_model=RepoResponse)
+async def update_repo(repo_id: int, update: RepoUpdate, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = await db.get(CodeRepository, repo_id)
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if not user.policy.can_write(repo.classification_rank, repo.compartments):
+        raise HTTPException(status_code=403, detail="Security Violation: No Write Down")
+
+    version = (repo.head_version or 1) + 1
+    manifest, tree, version_data = await run_in_threadpool(
+        _prepare_revision, repo.content_manifest, repo.integrity_tree, update.content, version
+    )
+    integrity_root = tree.root_hex()
+    repo.content_manifest = manifest
+    repo.integrity_root = integrity_root
+    repo.integrity_tree = tree.to_bytes()
+    repo.head_version = version
+    if update.description is not None:
+        repo.description = update.description
+    db.add(_version_row(repo, version, version_data, user.id))
+    await _index_repository(db, repo, update.content)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another update claimed this version number first
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Repository was updated concurrently, retry")
+    remember_version(repo_id, version, update.content)
+
+    owner = user.username
+    if repo.owner_id != user.id:
+        owner = (await db.execute(select(User.username).where(User.id == repo.owner_id))).scalar_one()
+
+    return _repo_json({
+        "id": repo.id,
+        "name": repo.name,
+        "description": repo.description,
+        "classification": repo.classification,
+        "compartments": compartment_names(repo.compartments),
+        "owner": owner,
+        "content": update.content,
+        "integrity_root": integrity_root,
+        "head_version": version,
+        "can_read": user.policy.can_read(repo.classification_rank, repo.compartments),
+        "can_write": True
+    })
 
 @router.get("/")
-def list_repos(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    repos = db.query(CodeRepository).all()
+async def list_repos(
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    metadata_only: bool = False,
+    stream: bool = False,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Keyset pagination on the primary key: pass the X-Next-Cursor header of
+    # one page as ?cursor= to fetch the next. BLP flags are computed by SQLite
+    # from classification_rank and the compartment mask so rows never
+    # round-trip through Python checks.
+    # ?stream=true instead returns every row after the cursor as NDJSON, one
+    # object per line, read from a server-side cursor; limit does not apply.
+    readable = user.policy.read_clause(CodeRepository.classification_rank, CodeRepository.compartments)
+    writable = user.policy.write_clause(CodeRepository.classification_rank, CodeRepository.compartments)
+    columns = [
+        CodeRepository.id,
+        CodeRepository.name,
+        CodeRepository.description,
+        CodeRepository.classification,
+        CodeRepository.compartments,
+        CodeRepository.owner_id,
+        CodeRepository.integrity_root,
+        CodeRepository.head_version,
+        readable.label("can_read"),
+        writable.label("can_write"),
+    ]
+    if not metadata_only:
+        # Redacted rows never get a manifest, so their chunks are never touched
+        columns.append(case((readable, CodeRepository.content_manifest), else_=null()).label("content_manifest"))
+
+    query = select(*columns)
+    if cursor is not None:
+        query = query.where(CodeRepository.id > cursor)
+    query = query.order_by(CodeRepository.id)
+    if stream:
+        return StreamingResponse(_stream_listing(query, metadata_only), media_type="application/x-ndjson")
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+
+    return ORJSONResponse(await run_in_threadpool(_listing_items, rows, metadata_only), headers=headers)
+
+async def _stream_listing(query, metadata_only: bool):
+    # Own session: the request's session may be closed before the body is sent
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions(STREAM_BATCH_SIZE):
+            yield await run_in_threadpool(_ndjson_lines, rows, metadata_only)
+
+def _ndjson_lines(rows, metadata_only: bool) -> bytes:
+    return b"".join(orjson.dumps(item) + b"\n" for item in _listing_items(rows, metadata_only))
+
+def _listing_items(rows, metadata_only: bool):
+    # Runs in the threadpool: reading chunks is blocking file I/O
     results = []
-    
-    # We list all, but content might be hidden or flags set
-    for repo in repos:
-        c_read = can_read(user.clearance_level, repo.classification)
-        c_write = can_write(user.clearance_level, repo.classification)
-        
-        results.append({
-            "id": repo.id,
-            "name": repo.name,
-            "description": repo.description,
-            "classification": repo.classification,
-            "owner_id": repo.owner_id,
-            "can_read": c_read,
-            "can_write": c_write,
-            "content": repo.content if c_read else "[REDACTED: INSUFFICIENT CLEARANCE]"
-        })
+    for row in rows:
+        item = {**row._mapping, "can_read": bool(row.can_read), "can_write": bool(row.can_write)}
+        item["compartments"] = compartment_names(row.compartments)
+        if not metadata_only:
+            manifest = item.pop("content_manifest")
+            item["content"] = read_content(manifest) if item["can_read"] else REDACTED_CONTENT
+        results.append(item)
     return results
+
+@router.get("/search")
+async def search_repos(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not _search_enabled(db):
+        raise HTTPException(status_code=501, detail="Search requires the SQLite FTS5 index")
+    match = match_expression(q, clearance_rank(user.clearance_level))
+    if match is None:
+        return ORJSONResponse([])
+    rows = (await db.execute(SEARCH_SQL, {"match": match, "deny": user.policy.deny, "limit": limit})).all()
+    return ORJSONResponse([dict(row._mapping) for row in rows])
+
+ArchiveFormat = Literal["ndjson", "tar"]
+
+@router.post("/import")
+async def import_repos(
+    request: Request,
+    archive_format: ArchiveFormat = Query("ndjson", alias="format"),
+    user: Principal = Depends(get_current_user),
+):
+    # The body is parsed, hashed and inserted batch by batch as it arrives;
+    # records failing validation or the write check are reported, not fatal
+    reader = io.BufferedReader(RequestBodyReader(request.stream()), buffer_size=256 * 1024)
+    return await run_in_threadpool(import_archive, reader, archive_format, user)
+
+@router.get("/export")
+async def export_repos(archive_format: ArchiveFormat = Query("ndjson", alias="format"), user: Principal = Depends(get_current_user)):
+    # Only readable repositories; sync generator, so Starlette drains it in the threadpool
+    media_type = "application/x-tar" if archive_format == "tar" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_export(user, archive_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="devvault-export.{archive_format}"'},
+    )
+
+@router.get("/{repo_id}/content")
+async def read_repo_content(repo_id: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    repo = (await db.execute(
+        select(CodeRepository.classification_rank, CodeRepository.compartments, CodeRepository.content_manifest)
+        .where(CodeRepository.id == repo_id)
+    )).first()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if not user.policy.can_read(repo.classification_rank, repo.compartments):
+        raise HTTPException(status_code=403, detail="Security Violation: No Read Up")
+
+    # Sync iterator: Starlette reads each chunk in the threadpool
+    chunks = iter_chunks(repo.content_manifest) if repo.content_manifest else iter(())
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
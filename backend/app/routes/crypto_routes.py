@@ -1,8 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Tuple
-from app.services.cryptography.hybrid_encryption import generate_key_pair, encrypt_message, decrypt_message
-from app.services.cryptography.threshold_crypto import split_secret, reconstruct_secret
+import base64
+import binascii
+import struct
+from app.services.cryptography.hybrid_encryption import (
+    encrypt_message, decrypt_message, encrypt_batch, decrypt_batch,
+    StreamEncryptor, StreamDecryptor,
+)
+from app.services.cryptography.key_cache import key_cache_stats
+from app.services.cryptography.key_pool import key_pool
+from app.utils.responses import DuplexStreamingResponse
+from app.services.cryptography.threshold_crypto import split_secret, reconstruct_secret, MAX_SHARES
 
 router = APIRouter()
 
@@ -14,19 +23,35 @@ class DecryptRequest(BaseModel):
     encrypted_data: dict
     private_key: str
 
+class BatchEncryptRequest(BaseModel):
+    messages: List[str]
+    public_key: str
+
+class BatchDecryptRequest(BaseModel):
+    encrypted_batch: dict
+    private_key: str
+
 class SplitRequest(BaseModel):
     secret: str
     n: int
     k: int
 
 class ReconstructRequest(BaseModel):
-    shares: List[Tuple[int, int]]
+    shares: List[Tuple[int, str]] # (x, base64 share)
 
 @router.get("/keys")
 def get_keys():
-    private, public = generate_key_pair()
+    private, public = key_pool.acquire()
     return {"private_key": private, "public_key": public}
 
+@router.get("/keys/pool")
+def key_pool_route():
+    return key_pool.stats()
+
+@router.get("/keys/cache")
+def key_cache_route():
+    return key_cache_stats()
+
 @router.post("/encrypt")
 def encrypt_route(req: EncryptRequest):
     try:
@@ -43,10 +68,94 @@ def decrypt_route(req: DecryptRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail="Decryption failed. Invalid Key or Data.")
 
+@router.post("/encrypt/batch")
+def encrypt_batch_route(req: BatchEncryptRequest):
+    try:
+        return encrypt_batch(req.messages, req.public_key)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/decrypt/batch")
+def decrypt_batch_route(req: BatchDecryptRequest):
+    try:
+        return {"messages": decrypt_batch(req.encrypted_batch, req.private_key)}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Decryption failed. Invalid Key or Data.")
+
+def _pem_from_header(value: str) -> str:
+    # PEM keys span several lines, so the streaming encrypt endpoint takes its public key base64-encoded
+    try:
+        return base64.b64decode(value, validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Key header must be a base64-encoded PEM key")
+
+@router.post("/encrypt/stream")
+async def encrypt_stream_route(request: Request, x_public_key: str = Header(...)):
+    # Raw binary body in, framed ciphertext out, one segment in memory at a time
+    try:
+        encryptor = StreamEncryptor(_pem_from_header(x_public_key))
+    except (ValueError, IndexError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        yield encryptor.header
+        async for chunk in request.stream():
+            out = encryptor.update(chunk)
+            if out:
+                yield out
+        yield encryptor.finalize()
+
+    return DuplexStreamingResponse(body(), media_type="application/octet-stream")
+
+# The private key leads the request body as u16 length | PEM bytes, never a
+# header: proxies and access logs record headers
+_KEY_FRAME = struct.Struct(">H")
+
+async def _read_key_frame(stream):
+    """
+    Returns the PEM key and whatever ciphertext arrived in the same chunks.
+    """
+    buffer = bytearray()
+    async for chunk in stream:
+        buffer += chunk
+        if len(buffer) < _KEY_FRAME.size:
+            continue
+        end = _KEY_FRAME.size + _KEY_FRAME.unpack_from(buffer)[0]
+        if len(buffer) >= end:
+            try:
+                return bytes(buffer[_KEY_FRAME.size:end]).decode("utf-8"), bytes(buffer[end:])
+            except UnicodeDecodeError:
+                break
+    raise HTTPException(status_code=400, detail="Body must start with a length-prefixed PEM private key")
+
+@router.post("/decrypt/stream")
+async def decrypt_stream_route(request: Request):
+    # Authentication failures mid-stream abort the response instead of returning 400
+    stream = request.stream()
+    pem, first = await _read_key_frame(stream)
+    try:
+        decryptor = StreamDecryptor(pem)
+    except (ValueError, IndexError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        out = decryptor.update(first)
+        if out:
+            yield out
+        async for chunk in stream:
+            out = decryptor.update(chunk)
+            if out:
+                yield out
+        decryptor.finalize()
+
+    return DuplexStreamingResponse(body(), media_type="application/octet-stream")
+
 @router.post("/split")
 def split_route(req: SplitRequest):
     if req.n < req.k:
         raise HTTPException(status_code=400, detail="n must be >= k")
+    if req.k < 1 or req.n > MAX_SHARES:
+        raise HTTPException(status_code=400, detail=f"k must be >= 1 and n <= {MAX_SHARES}")
     shares = split_secret(req.secret, req.n, req.k)
     return {"shares": shares}
 
@@ -1,15 +1,31 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import List
-from app.services.hashing.merkle_tree import get_merkle_root
-from app.services.hashing.digital_signature import sign_data, verify_signature
-from app.services.encoding.dna_encoding import dna_encode, dna_decode
+from typing import List, Optional
+from app.services.hashing.merkle_tree import get_merkle_root, build_merkle_tree, verify_proof
+from app.services.hashing.digital_signature import (
+    sign_data, verify_signature, sign_batch, verify_batch, sign_merkle_batch, verify_merkle_batch,
+)
+from app.services.encoding.dna_encoding import dna_encode, dna_decode, dna_encode_bytes, DnaStreamDecoder
+from app.utils.responses import DuplexStreamingResponse
 
 router = APIRouter()
 
 class MerkleRequest(BaseModel):
     data: List[str]
 
+class MerkleProofRequest(BaseModel):
+    data: List[str]
+    index: int
+
+class ProofStep(BaseModel):
+    hash: str
+    position: str # "left" or "right" of the running hash
+
+class MerkleVerifyRequest(BaseModel):
+    leaf: str
+    proof: List[ProofStep]
+    root_hash: str
+
 class SignRequest(BaseModel):
     data: str
     private_key: str
@@ -19,14 +35,57 @@ class VerifyRequest(BaseModel):
     signature: str
     public_key: str
 
+class BatchSignRequest(BaseModel):
+    items: List[str]
+    private_key: str
+    merkle: bool = False # Sign one Merkle root instead of every item
+
+class BatchVerifyItem(BaseModel):
+    data: str
+    signature: Optional[str] = None # Per-item mode
+    proof: Optional[List[ProofStep]] = None # Merkle mode
+
+class BatchVerifyRequest(BaseModel):
+    items: List[BatchVerifyItem]
+    public_key: str
+    root_hash: Optional[str] = None # Set for Merkle mode
+    root_signature: Optional[str] = None
+
 class DnaRequest(BaseModel):
     text: str
 
+def _proof_json(proof: list):
+    return [
+        {"hash": sibling.hex(), "position": "left" if is_left else "right"}
+        for sibling, is_left in proof
+    ]
+
+def _proof_from_steps(steps: List[ProofStep]):
+    try:
+        return [(bytes.fromhex(step.hash), step.position == "left") for step in steps]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Hashes must be hex encoded")
+
 @router.post("/merkle")
 def merkle_route(req: MerkleRequest):
     root = get_merkle_root(req.data)
     return {"root_hash": root}
 
+@router.post("/merkle/proof")
+def merkle_proof_route(req: MerkleProofRequest):
+    tree = build_merkle_tree(req.data)
+    if not 0 <= req.index < len(tree):
+        raise HTTPException(status_code=400, detail="index out of range")
+    return {"root_hash": tree.root_hex(), "proof": _proof_json(tree.proof(req.index))}
+
+@router.post("/merkle/verify")
+def merkle_verify_route(req: MerkleVerifyRequest):
+    try:
+        root = bytes.fromhex(req.root_hash)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Hashes must be hex encoded")
+    return {"valid": verify_proof(req.leaf, _proof_from_steps(req.proof), root)}
+
 @router.post("/sign")
 def sign_route(req: SignRequest):
     sig = sign_data(req.data, req.private_key)
@@ -37,6 +96,40 @@ def verify_route(req: VerifyRequest):
     valid = verify_signature(req.data, req.signature, req.public_key)
     return {"valid": valid}
 
+@router.post("/sign/batch")
+def sign_batch_route(req: BatchSignRequest):
+    try:
+        if req.merkle:
+            root_hash, root_signature, proofs = sign_merkle_batch(req.items, req.private_key)
+            return {
+                "root_hash": root_hash,
+                "root_signature": root_signature,
+                "proofs": [_proof_json(proof) for proof in proofs],
+            }
+        return {"signatures": sign_batch(req.items, req.private_key)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/verify/batch")
+def verify_batch_route(req: BatchVerifyRequest):
+    try:
+        if req.root_hash is not None:
+            if req.root_signature is None or any(item.proof is None for item in req.items):
+                raise HTTPException(status_code=400, detail="Merkle mode needs root_signature and a proof per item")
+            bytes.fromhex(req.root_hash)
+            results = verify_merkle_batch(
+                [item.data for item in req.items],
+                [_proof_from_steps(item.proof) for item in req.items],
+                req.root_hash, req.root_signature, req.public_key,
+            )
+        else:
+            if any(item.signature is None for item in req.items):
+                raise HTTPException(status_code=400, detail="Every item needs a signature")
+            results = verify_batch([(item.data, item.signature) for item in req.items], req.public_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
 @router.post("/dna/encode")
 def dna_enc(req: DnaRequest):
     return {"encoded": dna_encode(req.text)}
@@ -44,3 +137,26 @@ def dna_enc(req: DnaRequest):
 @router.post("/dna/decode")
 def dna_dec(req: DnaRequest):
     return {"decoded": dna_decode(req.text)}
+
+# Streaming variants take the raw request body, so multi-MB payloads never
+# become one JSON string in memory.
+@router.post("/dna/encode/stream")
+async def dna_enc_stream(request: Request):
+    async def body():
+        async for chunk in request.stream():
+            if chunk:
+                yield dna_encode_bytes(chunk)
+
+    return DuplexStreamingResponse(body(), media_type="text/plain")
+
+@router.post("/dna/decode/stream")
+async def dna_dec_stream(request: Request):
+    decoder = DnaStreamDecoder()
+
+    async def body():
+        async for chunk in request.stream():
+            out = decoder.update(chunk)
+            if out:
+                yield out
+
+    return DuplexStreamingResponse(body(), media_type="application/octet-stream")
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from app.database import get_async_db
+from app.models.code_repository import CodeRepository
+from app.models.repository_version import RepositoryVersion
+from app.routes.code_routes import get_current_user
+from app.services.authentication.principal_cache import Principal
+from app.services.storage.version_store import cached_version, materialize, unified_diff
+
+router = APIRouter()
+
+async def _require_readable(db: AsyncSession, repo_id: int, user: Principal):
+    label = (await db.execute(
+        select(CodeRepository.classification_rank, CodeRepository.compartments).where(CodeRepository.id == repo_id)
+    )).first()
+    if label is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if not user.policy.can_read(*label):
+        raise HTTPException(status_code=403, detail="Security Violation: No Read Up")
+
+async def _load_version(db: AsyncSession, repo_id: int, version: int) -> str:
+    content = cached_version(repo_id, version)
+    if content is not None:
+        return content
+
+    # Replay from the nearest snapshot, or from a cached revision after it
+    snapshot = (await db.execute(
+        select(func.max(RepositoryVersion.version))
+        .where(
+            RepositoryVersion.repo_id == repo_id,
+            RepositoryVersion.version <= version,
+            RepositoryVersion.is_snapshot.is_(True),
+        )
+    )).scalar()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    start, base = snapshot, None
+    for candidate in range(version - 1, snapshot - 1, -1):
+        base = cached_version(repo_id, candidate)
+        if base is not None:
+            start = candidate + 1
+            break
+
+    chain = (await db.execute(
+        select(RepositoryVersion.version, RepositoryVersion.is_snapshot, RepositoryVersion.data)
+        .where(RepositoryVersion.repo_id == repo_id, RepositoryVersion.version.between(start, version))
+        .order_by(RepositoryVersion.version)
+    )).all()
+    if not chain or chain[-1].version != version:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return await run_in_threadpool(materialize, repo_id, [tuple(row) for row in chain], base)
+
+@router.get("/{repo_id}/versions")
+async def list_versions(repo_id: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    await _require_readable(db, repo_id, user)
+    rows = (await db.execute(
+        select(
+            RepositoryVersion.version,
+            RepositoryVersion.parent_version,
+            RepositoryVersion.is_snapshot,
+            RepositoryVersion.size,
+            RepositoryVersion.integrity_root,
+            RepositoryVersion.author_id,
+            RepositoryVersion.created_at,
+        )
+        .where(RepositoryVersion.repo_id == repo_id)
+        .order_by(RepositoryVersion.version.desc())
+    )).all()
+    return [dict(row._mapping) for row in rows]
+
+@router.get("/{repo_id}/versions/{version}")
+async def get_version(repo_id: int, version: int, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    await _require_readable(db, repo_id, user)
+    content = await _load_version(db, repo_id, version)
+    return {"repo_id": repo_id, "version": version, "content": content}
+
+@router.get("/{repo_id}/versions/{version}/diff")
+async def diff_version(
+    repo_id: int,
+    version: int,
+    against: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Defaults to the diff against the parent revision
+    await _require_readable(db, repo_id, user)
+    against = version - 1 if against is None else against
+    old = await _load_version(db, repo_id, against) if against >= 1 else ""
+    new = await _load_version(db, repo_id, version)
+    diff = await run_in_threadpool(unified_diff, old, new, f"v{against}", f"v{version}")
+    return {"repo_id": repo_id, "from_version": against, "to_version": version, "diff": diff}
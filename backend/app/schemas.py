@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -25,5 +25,7 @@ class MFAVerify(BaseModel):
 
 class MFASetupResponse(BaseModel):
     uri: str
-    qr_code: str
     secret: str
+    qr_format: str = "png"
+    qr_code: Optional[str] = None # Base64 PNG or SVG
+    qr_matrix: Optional[List[str]] = None # Rows of 0/1 modules
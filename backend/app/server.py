@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from decouple import config
+
+# Production launcher: gunicorn master with uvicorn workers. The app is
+# imported once in the master and workers are forked from it (preload), so
+# they start in milliseconds and share the imported code pages. Schema
+# changes are not made here; run `python -m app.cli migrate` first.
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=multiprocessing.cpu_count(), cast=int)
+BIND = config("BIND", default="0.0.0.0:8000")
+WORKER_TIMEOUT = config("WORKER_TIMEOUT", default=60, cast=int)
+KEEPALIVE = config("KEEPALIVE", default=5, cast=int)
+# Proxies whose X-Forwarded-For is trusted as the client address (used by
+# the per-address login budget). Set it to the reverse proxy's address.
+FORWARDED_ALLOW_IPS = config("FORWARDED_ALLOW_IPS", default="127.0.0.1,::1")
+
+def serve(workers: int = None, bind: str = None):
+    # Imported here: gunicorn is POSIX-only and only needed for this command
+    from gunicorn.app.base import BaseApplication
+    from app.utils.shared_state import start_state_server
+
+    workers = workers or WEB_CONCURRENCY
+    # Before the app is loaded and forked: worker pools size themselves from it
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    state_dir = tempfile.mkdtemp(prefix="devvault-")
+    state_server = start_state_server(os.path.join(state_dir, "state.sock"))
+
+    class Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": bind or BIND,
+                "workers": workers,
+                "worker_class": "uvicorn_worker.UvicornWorker",
+                "preload_app": True,
+                "timeout": WORKER_TIMEOUT,
+                "graceful_timeout": WORKER_TIMEOUT,
+                "keepalive": KEEPALIVE,
+                "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            from app.utils.lazy import warm_up
+            warm_up() # Once in the master, shared by every forked worker
+            return app
+
+    try:
+        Application().run()
+    finally:
+        state_server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
@@ -1,7 +1,10 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from decouple import config
+from app.utils.lazy import lazy_import
+
+jwt = lazy_import("jose.jwt")
 
 SECRET_KEY = config("SECRET_KEY", default="supersecretkeyForDevVaultShouldBeChangedInEnv")
 ALGORITHM = "HS256"
@@ -13,7 +16,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti identifies the token for revocation
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -24,5 +28,5 @@ def verify_token(token: str, credentials_exception):
         if username is None:
             raise credentials_exception
         return payload
-    except JWTError:
+    except jwt.JWTError:
         raise credentials_exception
@@ -1,7 +1,33 @@
-import pyotp
-import qrcode
+import asyncio
 import io
 import base64
+import threading
+import time
+from functools import partial
+from decouple import config
+from app.utils.cache import LRUCache
+from app.utils.executors import get_process_pool
+from app.utils.lazy import lazy_import
+from app.utils.metrics import timed
+
+# qrcode pulls in PIL; both are only needed during MFA setup
+pyotp = lazy_import("pyotp")
+qrcode = lazy_import("qrcode")
+
+# Steps either side of the current one a code is still accepted for
+TOTP_VALID_WINDOW = config("TOTP_VALID_WINDOW", default=0, cast=int)
+
+# QR codes are rendered in their own process pool, off the event loop and
+# the request threadpool, and kept per (format, provisioning URI) for a few
+# minutes so setup retries and enrollment waves reuse them.
+QR_WORKERS = config("QR_WORKERS", default=1, cast=int)
+QR_CACHE_SIZE = config("QR_CACHE_SIZE", default=1024, cast=int)
+QR_CACHE_TTL = config("QR_CACHE_TTL", default=300, cast=int)
+QR_FORMATS = ("png", "svg", "matrix")
+
+_qr_cache = LRUCache(maxsize=QR_CACHE_SIZE, ttl=QR_CACHE_TTL)
+_rendering = {} # (format, uri) -> Future of a render in progress
+_rendering_lock = threading.Lock()
 
 def generate_mfa_secret():
     return pyotp.random_base32()
@@ -9,12 +35,71 @@ def generate_mfa_secret():
 def get_totp_uri(secret, username, issuer="DevVault"):
     return pyotp.totp.TOTP(secret).provisioning_uri(name=username, issuer_name=issuer)
 
-def verify_totp(secret, token):
+def verify_totp_step(secret, token):
+    """
+    Time step the token is valid for, or None. The step identifies the code
+    for replay checks: a step must not be accepted twice for the same user.
+    """
+    if not secret or not token:
+        return None
     totp = pyotp.TOTP(secret)
-    return totp.verify(token)
+    current = int(time.time()) // totp.interval
+    for step in range(current - TOTP_VALID_WINDOW, current + TOTP_VALID_WINDOW + 1):
+        if pyotp.utils.strings_equal(str(token), totp.generate_otp(step)):
+            return step
+    return None
+
+def verify_totp(secret, token):
+    return verify_totp_step(secret, token) is not None
 
 def generate_qr_code_base64(uri):
     img = qrcode.make(uri)
     buffered = io.BytesIO()
     img.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+def render_qr(uri: str, fmt: str = "png"):
+    """
+    png and svg: base64 image. matrix: rows of "0"/"1" modules without the
+    quiet zone, for clients that draw the code themselves. Only png
+    rasterizes through PIL.
+    """
+    if fmt == "matrix":
+        qr = qrcode.QRCode(border=0)
+        qr.add_data(uri)
+        qr.make(fit=True)
+        return ["".join("1" if module else "0" for module in row) for row in qr.get_matrix()]
+    if fmt == "svg":
+        from qrcode.image.svg import SvgPathImage
+        return base64.b64encode(qrcode.make(uri, image_factory=SvgPathImage).to_string()).decode("utf-8")
+    return generate_qr_code_base64(uri)
+
+def _rendered(key, future):
+    with _rendering_lock:
+        _rendering.pop(key, None)
+    if not future.cancelled() and future.exception() is None:
+        _qr_cache.set(key, future.result())
+
+@timed("render_qr")
+async def render_qr_async(uri: str, fmt: str = "png"):
+    """
+    render_qr in the QR worker pool, cached. Concurrent requests for the same
+    code wait on one render.
+    """
+    key = (fmt, uri)
+    cached = _qr_cache.get(key)
+    if cached is not None:
+        return cached
+    with _rendering_lock:
+        future = _rendering.get(key)
+        started = future is None
+        if started:
+            future = get_process_pool("qr", QR_WORKERS).submit(render_qr, uri, fmt)
+            _rendering[key] = future
+    if started:
+        # Outside the lock: the callback runs at once if the render already finished
+        future.add_done_callback(partial(_rendered, key))
+    return await asyncio.wrap_future(future)
+
+def qr_cache_stats() -> dict:
+    return _qr_cache.stats()
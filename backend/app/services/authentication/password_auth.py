@@ -1,4 +1,20 @@
+import asyncio
 import bcrypt
+from decouple import config
+from app.utils.executors import get_process_pool
+from app.utils.metrics import timed
+
+BCRYPT_ROUNDS = config("BCRYPT_ROUNDS", default=12, cast=int)
+# bcrypt holds the CPU for the whole hash, so it runs in its own process pool.
+# Once PASSWORD_QUEUE_LIMIT jobs are queued or running, new ones are refused
+# instead of piling up behind a login storm.
+PASSWORD_WORKERS = config("PASSWORD_WORKERS", default=2, cast=int)
+PASSWORD_QUEUE_LIMIT = config("PASSWORD_QUEUE_LIMIT", default=32, cast=int)
+
+_in_flight = 0
+
+class PasswordWorkersBusy(Exception):
+    pass
 
 def verify_password(plain_password, hashed_password):
     if isinstance(plain_password, str):
@@ -7,7 +23,37 @@ def verify_password(plain_password, hashed_password):
         hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password, hashed_password)
 
-def get_password_hash(password):
+def get_password_hash(password, rounds: int = None):
     if isinstance(password, str):
         password = password.encode('utf-8')
-    return bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode('utf-8')
+
+def needs_rehash(hashed_password: str) -> bool:
+    # Modular crypt format: $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def _run_in_pool(func, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_QUEUE_LIMIT:
+        raise PasswordWorkersBusy()
+    _in_flight += 1
+    try:
+        pool = get_process_pool("bcrypt", PASSWORD_WORKERS)
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    finally:
+        _in_flight -= 1
+
+# Timed in the parent: includes the wait for a free bcrypt worker
+@timed("verify_password")
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+@timed("hash_password")
+async def get_password_hash_async(password):
+    return await _run_in_pool(get_password_hash, password, BCRYPT_ROUNDS)
+
+def password_pool_stats() -> dict:
+    return {"in_flight": _in_flight, "queue_limit": PASSWORD_QUEUE_LIMIT, "workers": PASSWORD_WORKERS}
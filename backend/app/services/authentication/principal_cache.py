@@ -0,0 +1,50 @@
+import time
+from decouple import config
+from app.services.authorization.policy import compile_subject
+from app.utils.cache import LRUCache
+
+# Authenticated requests resolve their token to a principal through this cache
+# first, skipping the JWT decode and the users query. Entries live for at most
+# PRINCIPAL_CACHE_TTL seconds (never past the token's exp) and are dropped as
+# soon as auth_routes changes something the snapshot depends on.
+PRINCIPAL_CACHE_TTL = config("PRINCIPAL_CACHE_TTL", default=30, cast=int)
+PRINCIPAL_CACHE_SIZE = config("PRINCIPAL_CACHE_SIZE", default=4096, cast=int)
+
+class Principal:
+    """
+    Slim snapshot of the fields route handlers need from a User row.
+    """
+    __slots__ = ("id", "username", "clearance_level", "role", "compartments", "policy")
+
+    def __init__(self, id: int, username: str, clearance_level: str, role: str, compartments: int = 0):
+        self.id = id
+        self.username = username
+        self.clearance_level = clearance_level
+        self.role = role
+        self.compartments = compartments or 0
+        self.policy = compile_subject(clearance_level, self.compartments)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.clearance_level, user.role, user.compartments)
+
+_principals = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def get_cached_principal(token: str):
+    """
+    Returns (claims, principal) for a token seen recently, else None.
+    """
+    return _principals.get(token)
+
+def cache_principal(token: str, claims: dict, principal: Principal):
+    ttl = PRINCIPAL_CACHE_TTL
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        _principals.set(token, (claims, principal), ttl=ttl)
+
+def invalidate_user(username: str):
+    _principals.discard_where(lambda _token, entry: entry[1].username == username)
+
+def principal_cache_stats() -> dict:
+    return _principals.stats()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from decouple import config
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Revoked token ids (the jti claim) live in the revoked_tokens table and, per
+# worker, in an in-memory denylist checked on every authenticated request: a
+# dict lookup, no query. Each worker loads the table at startup and polls it
+# for rows added since, so a token revoked on one worker (or from the CLI) is
+# refused everywhere within REVOCATION_SYNC_INTERVAL seconds, and at once on
+# the worker that revoked it. Entries are dropped when the token expires.
+REVOCATION_SYNC_INTERVAL = config("REVOCATION_SYNC_INTERVAL", default=1.0, cast=float)
+# Each poll rereads this many seconds before the newest revoked_at it has
+# seen. Rows are stamped before they commit, and concurrent transactions can
+# commit out of order, so a row may appear with an older stamp than one
+# already read; the overlap catches it and the dict absorbs the repeats.
+REVOCATION_SYNC_OVERLAP = config("REVOCATION_SYNC_OVERLAP", default=30, cast=int)
+REVOCATION_PRUNE_INTERVAL = config("REVOCATION_PRUNE_INTERVAL", default=60, cast=int)
+
+class RevocationList:
+    def __init__(self):
+        self._revoked = {} # jti -> exp
+        self._watermark = None # Newest revoked_at read so far
+        self._next_prune = 0.0
+        self._task = None
+
+    def is_revoked(self, jti) -> bool:
+        return jti is not None and jti in self._revoked
+
+    def add(self, jti: str, exp: int):
+        self._revoked[jti] = exp
+
+    def prune(self):
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self._next_prune = now + REVOCATION_PRUNE_INTERVAL
+
+    async def sync(self, db):
+        query = (
+            select(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+            .where(RevokedToken.expires_at > int(time.time()))
+        )
+        if self._watermark is not None:
+            query = query.where(RevokedToken.revoked_at > self._watermark - timedelta(seconds=REVOCATION_SYNC_OVERLAP))
+        for jti, exp, revoked_at in (await db.execute(query)).all():
+            self._revoked[jti] = exp
+            if self._watermark is None or revoked_at > self._watermark:
+                self._watermark = revoked_at
+        if time.time() >= self._next_prune:
+            self.prune()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.sync(db)
+            except Exception:
+                logger.exception("Revocation sync failed, retrying")
+
+    async def start(self):
+        """
+        Load current revocations and keep polling for new ones. Rows for
+        tokens that have expired are deleted on the way.
+        """
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= int(time.time())))
+            await db.commit()
+            await self.sync(db)
+        self._task = asyncio.create_task(self._poll())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"size": len(self._revoked)}
+
+revocations = RevocationList()
+
+def add_revocation(session, jti: str, exp: int):
+    # Sync session: called through AsyncSession.run_sync and from the CLI
+    if session.execute(select(RevokedToken.id).where(RevokedToken.jti == jti)).first() is None:
+        session.add(RevokedToken(jti=jti, expires_at=int(exp)))
+
+async def revoke_token(db, jti: str, exp: int):
+    try:
+        await db.run_sync(add_revocation, jti, exp)
+        await db.commit()
+    except IntegrityError: # Revoked concurrently by another request
+        await db.rollback()
+    revocations.add(jti, exp)
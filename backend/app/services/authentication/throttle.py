@@ -0,0 +1,50 @@
+from decouple import config
+from app.utils.shared_state import get_state_backend
+
+# Attempt budgets, as bucket size and tokens regained per second. Login is
+# limited per username and per client address so neither spraying one
+# account nor many accounts from one address is cheap; OTP checks get a
+# tighter budget per user since a 6-digit code falls to ~10^6 guesses.
+# Login attempts are charged up front and refunded when the login succeeds,
+# so only failures count against either budget.
+LOGIN_RATE_CAPACITY = config("LOGIN_RATE_CAPACITY", default=10, cast=float)
+LOGIN_RATE_PER_SECOND = config("LOGIN_RATE_PER_SECOND", default=0.2, cast=float)
+# One address can stand for many users (NAT, corporate egress), so it gets a
+# larger budget. The address is request.client.host: behind a reverse proxy
+# that is the X-Forwarded-For client only when the proxy is listed in
+# FORWARDED_ALLOW_IPS (see app.server); otherwise every user shares the
+# proxy's address and this bucket.
+LOGIN_ADDR_RATE_CAPACITY = config("LOGIN_ADDR_RATE_CAPACITY", default=100, cast=float)
+LOGIN_ADDR_RATE_PER_SECOND = config("LOGIN_ADDR_RATE_PER_SECOND", default=2, cast=float)
+OTP_RATE_CAPACITY = config("OTP_RATE_CAPACITY", default=5, cast=float)
+OTP_RATE_PER_SECOND = config("OTP_RATE_PER_SECOND", default=0.05, cast=float)
+# Used codes are remembered past the last step verify_totp would still accept
+OTP_REPLAY_TTL = config("OTP_REPLAY_TTL", default=120, cast=int)
+
+class RateLimiter:
+    def __init__(self, name: str, capacity: float, per_second: float):
+        self.name = name
+        self.capacity = capacity
+        self.per_second = per_second
+
+    async def hit(self, key: str) -> float:
+        """
+        Count one attempt for key. Returns 0 if allowed, else seconds to wait.
+        """
+        return await get_state_backend().take_token(f"rate:{self.name}:{key}", self.capacity, self.per_second)
+
+    async def refund(self, key: str):
+        """
+        Give back the attempt counted by hit, for attempts that succeeded.
+        """
+        await get_state_backend().take_token(f"rate:{self.name}:{key}", self.capacity, self.per_second, cost=-1)
+
+login_by_user = RateLimiter("login-user", LOGIN_RATE_CAPACITY, LOGIN_RATE_PER_SECOND)
+login_by_address = RateLimiter("login-addr", LOGIN_ADDR_RATE_CAPACITY, LOGIN_ADDR_RATE_PER_SECOND)
+otp_attempts = RateLimiter("otp", OTP_RATE_CAPACITY, OTP_RATE_PER_SECOND)
+
+async def claim_otp(username: str, time_step: int) -> bool:
+    """
+    Mark a user's code for one TOTP time step as used; False if it already was.
+    """
+    return await get_state_backend().add_once(f"otp-used:{username}:{time_step}", OTP_REPLAY_TTL)
@@ -8,6 +8,9 @@ LEVEL_HIERARCHY = {
     ClearanceLevel.TOP_SECRET: 3
 }
 
+def clearance_rank(level: str) -> int:
+    return LEVEL_HIERARCHY.get(level, 0)
+
 def can_read(user_level: str, resource_level: str) -> bool:
     """
     Bell-LaPadula Simple Security Property: No Read Up.
@@ -0,0 +1,96 @@
+from functools import lru_cache
+from decouple import Csv, config
+from sqlalchemy import and_
+from app.services.authorization.bell_lapadula import LEVEL_HIERARCHY, clearance_rank
+
+# Labels are (classification rank, compartment bitmask). Compartment i of
+# SECURITY_COMPARTMENTS is bit i of the mask stored on users and repositories,
+# so the list may only ever be appended to. A subject reads an object when its
+# rank is at least the object's and it holds every compartment the object has
+# (Simple Security); it writes when the object dominates it the same way
+# (*-Property).
+SECURITY_COMPARTMENTS = config("SECURITY_COMPARTMENTS", default="", cast=Csv())
+
+# Masks live in signed 64-bit INTEGER columns and are filtered with SQL &
+MAX_COMPARTMENTS = 63
+if len(SECURITY_COMPARTMENTS) > MAX_COMPARTMENTS:
+    raise ValueError(f"SECURITY_COMPARTMENTS supports at most {MAX_COMPARTMENTS} compartments")
+
+COMPARTMENT_BITS = {name: 1 << i for i, name in enumerate(SECURITY_COMPARTMENTS)}
+ALL_COMPARTMENTS = (1 << len(SECURITY_COMPARTMENTS)) - 1
+
+def compartment_mask(names) -> int:
+    mask = 0
+    for name in names:
+        try:
+            mask |= COMPARTMENT_BITS[name]
+        except KeyError:
+            raise ValueError(f"Unknown compartment: {name}") from None
+    return mask
+
+def compartment_names(mask: int) -> list:
+    return [name for name, bit in COMPARTMENT_BITS.items() if mask & bit]
+
+# Level dominance, precomputed: entry u is a bitmask over object ranks, bit r
+# set when a subject at rank u may read (resp. write) an object at rank r
+_LEVELS = range(len(LEVEL_HIERARCHY))
+_READ_RANKS = tuple(sum(1 << r for r in _LEVELS if u >= r) for u in _LEVELS)
+_WRITE_RANKS = tuple(sum(1 << r for r in _LEVELS if u <= r) for u in _LEVELS)
+
+class SubjectPolicy:
+    """
+    Access decisions for one (clearance, compartments) subject, compiled to a
+    few integers so each check is a shift and two ANDs whatever the number of
+    compartments. Get instances from compile_subject(), which shares them.
+    """
+    __slots__ = ("rank", "mask", "_read_ranks", "_write_ranks", "_lacks", "deny")
+
+    def __init__(self, rank: int, mask: int = 0):
+        self.rank = rank
+        self.mask = mask
+        self._read_ranks = _READ_RANKS[rank]
+        self._write_ranks = _WRITE_RANKS[rank]
+        self._lacks = ~mask # Every compartment the subject lacks, however many bits
+        self.deny = ALL_COMPARTMENTS & ~mask # The same within the configured ones, for SQL
+
+    def can_read(self, rank: int, mask: int = 0) -> bool:
+        return bool(self._read_ranks >> rank & 1) and not mask & self._lacks
+
+    def can_write(self, rank: int, mask: int = 0) -> bool:
+        return bool(self._write_ranks >> rank & 1) and self.mask & ~mask == 0
+
+    def check_many(self, resources) -> list:
+        """
+        (can_read, can_write) for each (rank, mask) label in resources.
+        """
+        read_ranks, write_ranks, lacks, own = self._read_ranks, self._write_ranks, self._lacks, self.mask
+        return [
+            (bool(read_ranks >> rank & 1) and not mask & lacks, bool(write_ranks >> rank & 1) and own & ~mask == 0)
+            for rank, mask in resources
+        ]
+
+    def read_clause(self, rank_column, mask_column):
+        """
+        SQL form of can_read over rank and compartment mask columns.
+        """
+        if not self.deny:
+            return rank_column <= self.rank
+        return and_(rank_column <= self.rank, mask_column.op("&")(self.deny) == 0)
+
+    def write_clause(self, rank_column, mask_column):
+        """
+        SQL form of can_write over rank and compartment mask columns.
+        """
+        if not self.mask:
+            return rank_column >= self.rank
+        return and_(rank_column >= self.rank, mask_column.op("&")(self.mask) == self.mask)
+
+@lru_cache(maxsize=1024)
+def _compiled(rank: int, mask: int) -> SubjectPolicy:
+    return SubjectPolicy(rank, mask)
+
+def compile_subject(clearance_level: str, compartments: int = 0) -> SubjectPolicy:
+    return _compiled(clearance_rank(clearance_level), compartments or 0)
+
+def check_many(subject: SubjectPolicy, resources) -> list:
+    return subject.check_many(resources)
@@ -1,7 +1,13 @@
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import AES, PKCS1_OAEP
-from Crypto.Random import get_random_bytes
+from app.services.cryptography.key_cache import import_rsa_key
+from app.utils.lazy import lazy_import
+from app.utils.metrics import timed
 import base64
+import struct
+
+RSA = lazy_import("Crypto.PublicKey.RSA")
+AES = lazy_import("Crypto.Cipher.AES")
+PKCS1_OAEP = lazy_import("Crypto.Cipher.PKCS1_OAEP")
+Random = lazy_import("Crypto.Random")
 
 def generate_key_pair():
     key = RSA.generate(2048)
@@ -9,12 +15,13 @@ def generate_key_pair():
     public_key = key.publickey().export_key()
     return private_key.decode('utf-8'), public_key.decode('utf-8')
 
+@timed("encrypt_message")
 def encrypt_message(message: str, public_key_str: str):
     # 1. Generate AES Session Key
-    session_key = get_random_bytes(16)
+    session_key = Random.get_random_bytes(16)
 
     # 2. Encrypt AES key with RSA Public Key
-    recipient_key = RSA.import_key(public_key_str)
+    recipient_key = import_rsa_key(public_key_str)
     cipher_rsa = PKCS1_OAEP.new(recipient_key)
     enc_session_key = cipher_rsa.encrypt(session_key)
 
@@ -31,7 +38,7 @@ def encrypt_message(message: str, public_key_str: str):
 
 def decrypt_message(encrypted_data: dict, private_key_str: str):
     # 1. Decrypt AES Session Key with RSA Private Key
-    private_key = RSA.import_key(private_key_str)
+    private_key = import_rsa_key(private_key_str)
     cipher_rsa = PKCS1_OAEP.new(private_key)
     enc_session_key = base64.b64decode(encrypted_data["enc_session_key"])
     session_key = cipher_rsa.decrypt(enc_session_key)
@@ -44,3 +51,160 @@ def decrypt_message(encrypted_data: dict, private_key_str: str):
     cipher_aes = AES.new(session_key, AES.MODE_EAX, nonce)
     data = cipher_aes.decrypt_and_verify(ciphertext, tag)
     return data.decode("utf-8")
+
+def encrypt_batch(messages: list, public_key_str: str):
+    # One RSA-OAEP wrap for the whole batch; every message gets its own nonce
+    session_key = Random.get_random_bytes(16)
+    recipient_key = import_rsa_key(public_key_str)
+    enc_session_key = PKCS1_OAEP.new(recipient_key).encrypt(session_key)
+
+    items = []
+    for message in messages:
+        cipher_aes = AES.new(session_key, AES.MODE_EAX)
+        ciphertext, tag = cipher_aes.encrypt_and_digest(message.encode("utf-8"))
+        items.append({
+            "nonce": base64.b64encode(cipher_aes.nonce).decode("utf-8"),
+            "tag": base64.b64encode(tag).decode("utf-8"),
+            "ciphertext": base64.b64encode(ciphertext).decode("utf-8")
+        })
+
+    return {
+        "enc_session_key": base64.b64encode(enc_session_key).decode("utf-8"),
+        "messages": items
+    }
+
+def decrypt_batch(encrypted_batch: dict, private_key_str: str):
+    private_key = import_rsa_key(private_key_str)
+    enc_session_key = base64.b64decode(encrypted_batch["enc_session_key"])
+    session_key = PKCS1_OAEP.new(private_key).decrypt(enc_session_key)
+
+    messages = []
+    for item in encrypted_batch["messages"]:
+        cipher_aes = AES.new(session_key, AES.MODE_EAX, base64.b64decode(item["nonce"]))
+        data = cipher_aes.decrypt_and_verify(
+            base64.b64decode(item["ciphertext"]), base64.b64decode(item["tag"])
+        )
+        messages.append(data.decode("utf-8"))
+    return messages
+
+# Streaming format
+#   header:  magic | u16 len(enc_session_key) | enc_session_key | 8-byte nonce prefix
+#   segment: u8 final flag | u32 len(ciphertext) | ciphertext | 16-byte GCM tag
+# Segment nonces are the prefix plus a 32-bit counter and the final flag is
+# authenticated, so reordered, dropped or truncated segments fail to decrypt.
+STREAM_MAGIC = b"DVS1"
+SEGMENT_SIZE = 64 * 1024
+MAX_SEGMENT_SIZE = 16 * 1024 * 1024
+_NONCE_PREFIX_SIZE = 8
+_TAG_SIZE = 16
+_SEGMENT_HEADER = struct.Struct(">BI")
+
+def _segment_cipher(session_key: bytes, nonce_prefix: bytes, counter: int, final: bool):
+    cipher = AES.new(session_key, AES.MODE_GCM, nonce=nonce_prefix + struct.pack(">I", counter))
+    cipher.update(b"\x01" if final else b"\x00")
+    return cipher
+
+class StreamEncryptor:
+    def __init__(self, public_key_str: str, segment_size: int = SEGMENT_SIZE):
+        self._session_key = Random.get_random_bytes(16)
+        self._nonce_prefix = Random.get_random_bytes(_NONCE_PREFIX_SIZE)
+        self._segment_size = segment_size
+        self._counter = 0
+        self._buffer = bytearray()
+
+        recipient_key = import_rsa_key(public_key_str)
+        enc_session_key = PKCS1_OAEP.new(recipient_key).encrypt(self._session_key)
+        self.header = STREAM_MAGIC + struct.pack(">H", len(enc_session_key)) + enc_session_key + self._nonce_prefix
+
+    def _seal(self, data, final: bool) -> bytes:
+        cipher = _segment_cipher(self._session_key, self._nonce_prefix, self._counter, final)
+        self._counter += 1
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return _SEGMENT_HEADER.pack(final, len(ciphertext)) + ciphertext + tag
+
+    def update(self, data) -> bytes:
+        self._buffer += data
+        out = bytearray()
+        # Always hold back the tail so the last segment can carry the final flag
+        while len(self._buffer) > self._segment_size:
+            out += self._seal(bytes(self._buffer[:self._segment_size]), False)
+            del self._buffer[:self._segment_size]
+        return bytes(out)
+
+    def finalize(self) -> bytes:
+        out = self._seal(bytes(self._buffer), True)
+        self._buffer.clear()
+        return out
+
+class StreamDecryptor:
+    def __init__(self, private_key_str: str):
+        self._cipher_rsa = PKCS1_OAEP.new(import_rsa_key(private_key_str))
+        self._session_key = None
+        self._nonce_prefix = None
+        self._counter = 0
+        self._finished = False
+        self._buffer = bytearray()
+
+    def _read_header(self) -> bool:
+        fixed = len(STREAM_MAGIC) + 2
+        if len(self._buffer) < fixed:
+            return False
+        if self._buffer[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+            raise ValueError("Not an encrypted stream")
+        key_len = struct.unpack(">H", self._buffer[len(STREAM_MAGIC):fixed])[0]
+        end = fixed + key_len + _NONCE_PREFIX_SIZE
+        if len(self._buffer) < end:
+            return False
+        self._session_key = self._cipher_rsa.decrypt(bytes(self._buffer[fixed:fixed + key_len]))
+        self._nonce_prefix = bytes(self._buffer[fixed + key_len:end])
+        del self._buffer[:end]
+        return True
+
+    def update(self, data) -> bytes:
+        self._buffer += data
+        if self._session_key is None and not self._read_header():
+            return b""
+
+        out = bytearray()
+        while len(self._buffer) >= _SEGMENT_HEADER.size:
+            if self._finished:
+                raise ValueError("Data after final segment")
+            final, length = _SEGMENT_HEADER.unpack(self._buffer[:_SEGMENT_HEADER.size])
+            if length > MAX_SEGMENT_SIZE:
+                raise ValueError("Segment too large")
+            end = _SEGMENT_HEADER.size + length + _TAG_SIZE
+            if len(self._buffer) < end:
+                break
+            ciphertext = bytes(self._buffer[_SEGMENT_HEADER.size:end - _TAG_SIZE])
+            tag = bytes(self._buffer[end - _TAG_SIZE:end])
+            cipher = _segment_cipher(self._session_key, self._nonce_prefix, self._counter, bool(final))
+            out += cipher.decrypt_and_verify(ciphertext, tag)
+            self._counter += 1
+            self._finished = bool(final)
+            del self._buffer[:end]
+        return bytes(out)
+
+    def finalize(self):
+        if not self._finished or self._buffer:
+            raise ValueError("Encrypted stream is truncated")
+
+def encrypt_stream(chunks, public_key_str: str):
+    """
+    Encrypt an iterable of byte chunks, yielding framed ciphertext.
+    Memory use is bounded by the segment size, not the payload size.
+    """
+    encryptor = StreamEncryptor(public_key_str)
+    yield encryptor.header
+    for chunk in chunks:
+        out = encryptor.update(chunk)
+        if out:
+            yield out
+    yield encryptor.finalize()
+
+def decrypt_stream(chunks, private_key_str: str):
+    decryptor = StreamDecryptor(private_key_str)
+    for chunk in chunks:
+        out = decryptor.update(chunk)
+        if out:
+            yield out
+    decryptor.finalize()
@@ -0,0 +1,29 @@
+import hashlib
+from decouple import config
+from app.utils.cache import LRUCache
+from app.utils.lazy import lazy_import
+from app.utils.metrics import span
+
+RSA = lazy_import("Crypto.PublicKey.RSA")
+
+# Parsing a PEM private key (base64, ASN.1, CRT values) costs far more than
+# the hash lookup, so parsed keys are kept per process keyed by PEM fingerprint.
+KEY_CACHE_SIZE = config("KEY_CACHE_SIZE", default=256, cast=int)
+KEY_CACHE_TTL = config("KEY_CACHE_TTL", default=3600, cast=int)
+
+_key_cache = LRUCache(maxsize=KEY_CACHE_SIZE, ttl=KEY_CACHE_TTL)
+
+def key_fingerprint(pem: str) -> str:
+    if isinstance(pem, str):
+        pem = pem.encode('utf-8')
+    return hashlib.sha256(pem).hexdigest()
+
+def _parse_key(pem: str):
+    with span("rsa_import_key"):
+        return RSA.import_key(pem)
+
+def import_rsa_key(pem: str):
+    return _key_cache.get_or_create(key_fingerprint(pem), lambda: _parse_key(pem))
+
+def key_cache_stats() -> dict:
+    return _key_cache.stats()
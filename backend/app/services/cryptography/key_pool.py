@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import deque
+from decouple import config
+from app.services.cryptography.hybrid_encryption import generate_key_pair
+from app.utils.executors import get_process_pool, pool_size
+
+KEY_POOL_SIZE = config("KEY_POOL_SIZE", default=8, cast=int)
+KEY_POOL_WORKERS = config("KEY_POOL_WORKERS", default=0, cast=int) # 0: up to 2, within pool_size()
+
+def _generate_timed():
+    start = time.perf_counter()
+    private_key, public_key = generate_key_pair()
+    return private_key, public_key, time.perf_counter() - start
+
+class KeyPool:
+    """
+    Reserve of pre-generated RSA keypairs, refilled in a background process
+    pool so RSA.generate never runs on a request thread unless the reserve
+    is empty.
+    """
+
+    def __init__(self, size: int = KEY_POOL_SIZE, workers: int = KEY_POOL_WORKERS):
+        self.size = size
+        self.workers = workers
+        self._reserve = deque()
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self.served_from_pool = 0
+        self.generated_on_demand = 0
+        self.failures = 0
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._last_latency = None
+
+    def start(self):
+        if self.size > 0:
+            self._executor = get_process_pool("keygen", self.workers or min(2, pool_size()))
+            self.refill()
+
+    def stop(self):
+        self._executor = None
+
+    def _record_latency(self, seconds: float):
+        self._latency_total += seconds
+        self._latency_count += 1
+        self._last_latency = seconds
+
+    def refill(self):
+        executor = self._executor
+        if executor is None:
+            return
+        with self._lock:
+            missing = self.size - len(self._reserve) - self._pending
+            if missing <= 0:
+                return
+            self._pending += missing
+        for _ in range(missing):
+            try:
+                future = executor.submit(_generate_timed)
+            except RuntimeError: # Pool already shut down
+                with self._lock:
+                    self._pending -= 1
+                continue
+            future.add_done_callback(self._on_generated)
+
+    def _on_generated(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failures += 1
+                return
+            private_key, public_key, elapsed = future.result()
+            self._reserve.append((private_key, public_key))
+            self._record_latency(elapsed)
+
+    def acquire(self):
+        with self._lock:
+            pair = self._reserve.popleft() if self._reserve else None
+            if pair is not None:
+                self.served_from_pool += 1
+
+        if pair is None:
+            # Reserve drained (or pool not started): generate on this thread
+            start = time.perf_counter()
+            pair = generate_key_pair()
+            with self._lock:
+                self.generated_on_demand += 1
+                self._record_latency(time.perf_counter() - start)
+
+        self.refill()
+        return pair
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "depth": len(self._reserve),
+                "target_depth": self.size,
+                "pending": self._pending,
+                "served_from_pool": self.served_from_pool,
+                "generated_on_demand": self.generated_on_demand,
+                "failures": self.failures,
+                "last_generation_seconds": self._last_latency,
+                "avg_generation_seconds": self._latency_total / self._latency_count if self._latency_count else None,
+            }
+
+key_pool = KeyPool()
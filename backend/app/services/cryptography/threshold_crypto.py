@@ -1,71 +1,105 @@
-import random
+import base64
+import secrets
+from functools import lru_cache
+from app.utils.lazy import lazy_import
 
-# Prime number larger than any possible byte value (256)
-# Ideally 12th Mersenne Prime 2**127 - 1 for high security
-PRIME = 2**127 - 1
+np = lazy_import("numpy") # Only loaded by the first split or reconstruct
 
-def _eval_poly(poly, x):
-    accum = 0
-    for coeff in reversed(poly):
-        accum = (accum * x + coeff) % PRIME
-    return accum
+# Shamir's Secret Sharing over GF(256), applied to every byte of the secret
+# at once. Multiplying a whole byte string by a field constant is a single
+# bytes.translate through that constant's 256-entry table, and field addition
+# is XOR, done in place on numpy byte arrays. Secrets of any length and
+# content are supported; shares are as long as the secret.
 
-def split_secret(secret_str: str, n: int, k: int):
-    # Convert string to integer
-    secret_int = int.from_bytes(secret_str.encode('utf-8'), 'big')
-    
-    # Generate random coefficients
-    poly = [secret_int] + [random.SystemRandom().randint(0, PRIME - 1) for _ in range(k - 1)]
-    
-    shares = []
-    for i in range(1, n + 1):
-        x = i
-        y = _eval_poly(poly, x)
-        shares.append((x, y))
-    
-    return shares
+# Log/antilog tables for GF(2^8) with the AES polynomial x^8 + x^4 + x^3 + x + 1
+_EXP = [0] * 510
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _x
+    _LOG[_x] = _i
+    _x ^= (_x << 1) ^ (0x11b if _x & 0x80 else 0) # multiply by generator 3
+for _i in range(255, 510):
+    _EXP[_i] = _EXP[_i - 255]
 
-def _extended_gcd(a, b):
-    x = 0
-    last_x = 1
-    y = 1
-    last_y = 0
-    while b != 0:
-        quot = a // b
-        a, b = b, a % b
-        x, last_x = last_x - quot * x, x
-        y, last_y = last_y - quot * y, y
-    return last_x, last_y
+MAX_SHARES = 255
 
-def _divmod(num, den, p):
-    inv, _ = _extended_gcd(den, p)
-    return num * inv * 1
+def _gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
 
-def reconstruct_secret(shares):
-    # Lagrange Interpolation
-    x_s, y_s = zip(*shares)
-    k = len(shares)
-    
-    secret = 0
-    
-    for i in range(k):
+def _gf_div(a: int, b: int) -> int:
+    if a == 0:
+        return 0
+    return _EXP[_LOG[a] - _LOG[b] + 255]
+
+@lru_cache(maxsize=256)
+def _mul_table(c: int) -> bytes:
+    return bytes(_gf_mul(c, b) for b in range(256))
+
+def _lagrange_at(x_s, x: int = 0):
+    # Weight of each known point in the polynomial's value at x, the same
+    # for every byte position. Subtraction is XOR in GF(256).
+    coefficients = []
+    for i, x_i in enumerate(x_s):
         numerator = 1
         denominator = 1
-        for j in range(k):
+        for j, x_j in enumerate(x_s):
             if i == j:
                 continue
-            numerator = (numerator * (0 - x_s[j])) % PRIME
-            denominator = (denominator * (x_s[i] - x_s[j])) % PRIME
-        
-        lagrange_poly = y_s[i] * numerator * pow(denominator, -1, PRIME)
-        secret = (secret + lagrange_poly) % PRIME
-        
-    # Convert integer back to string
-    # Need to handle potential byte sizing issues if secret was small
-    # For demo, this works for ASCII
+            numerator = _gf_mul(numerator, x ^ x_j)
+            denominator = _gf_mul(denominator, x_i ^ x_j)
+        coefficients.append(_gf_div(numerator, denominator))
+    return coefficients
+
+def _combine(coefficients, values, length: int) -> bytes:
+    # Sum of coefficient * value over whole byte strings: one translate and
+    # one in-place XOR per term
+    acc = np.zeros(length, dtype=np.uint8)
+    for coefficient, value in zip(coefficients, values):
+        if coefficient == 1:
+            acc ^= np.frombuffer(value, dtype=np.uint8)
+        elif coefficient:
+            acc ^= np.frombuffer(value.translate(_mul_table(coefficient)), dtype=np.uint8)
+    return acc.tobytes()
+
+def split_bytes(secret: bytes, n: int, k: int):
+    if not 1 <= k <= n <= MAX_SHARES:
+        raise ValueError(f"Need 1 <= k <= n <= {MAX_SHARES}")
+
+    # Rather than drawing k-1 random coefficients and evaluating at every x,
+    # draw the first k-1 shares: with the secret at x=0 they fix a uniformly
+    # random polynomial of degree k-1, and each remaining share is its
+    # Lagrange interpolation from those k points. (n-k+1)*k passes instead
+    # of n*(k-1).
+    length = len(secret)
+    shares = [(x, secrets.token_bytes(length)) for x in range(1, k)]
+    known_x = [0] + [x for x, _ in shares]
+    known_y = [secret] + [y for _, y in shares]
+    for x in range(k, n + 1):
+        shares.append((x, _combine(_lagrange_at(known_x, x), known_y, length)))
+    return shares
+
+def reconstruct_bytes(shares) -> bytes:
+    if not shares:
+        raise ValueError("No shares given")
+    x_s = [x for x, _ in shares]
+    if len(set(x_s)) != len(x_s) or not all(1 <= x <= MAX_SHARES for x in x_s):
+        raise ValueError("Share indexes must be distinct and between 1 and 255")
+    length = len(shares[0][1])
+    if any(len(y) != length for _, y in shares):
+        raise ValueError("Shares have different lengths")
+
+    return _combine(_lagrange_at(x_s), [y for _, y in shares], length)
+
+def split_secret(secret_str: str, n: int, k: int):
+    shares = split_bytes(secret_str.encode('utf-8'), n, k)
+    return [(x, base64.b64encode(y).decode('utf-8')) for x, y in shares]
+
+def reconstruct_secret(shares):
     try:
-        length = (secret.bit_length() + 7) // 8
-        return secret.to_bytes(length, 'big').decode('utf-8')
-    except:
+        secret = reconstruct_bytes([(x, base64.b64decode(y)) for x, y in shares])
+        return secret.decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
         return "[Error: Could not decode secret]"
-
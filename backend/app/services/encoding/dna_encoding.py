@@ -1,26 +1,70 @@
-def dna_encode(data: str):
+BASES = b"ACGT" # 00=A, 01=C, 10=G, 11=T
+
+# One 256-entry table per 2-bit group of a byte (most significant first), so
+# encoding is four bytes.translate calls interleaved into the output buffer.
+_ENCODE_TABLES = [bytes(BASES[(b >> shift) & 3] for b in range(256)) for shift in (6, 4, 2, 0)]
+
+# Reverse table: base -> 2-bit value. Anything that is not a base is deleted
+# before decoding, matching the old behaviour of skipping unknown characters.
+_DECODE_TABLE = bytes(BASES.index(b) if b in BASES else 0 for b in range(256))
+_NON_BASES = bytes(b for b in range(256) if b not in BASES)
+
+def dna_encode_bytes(data: bytes) -> bytes:
+    out = bytearray(len(data) * 4)
+    for offset, table in enumerate(_ENCODE_TABLES):
+        out[offset::4] = data.translate(table)
+    return bytes(out)
+
+def _decode_values(values: bytes) -> bytes:
+    # values holds one 2-bit number per byte, length a multiple of 4. Each
+    # stride is read as a big integer and shifted into place; no byte can
+    # carry into its neighbour because 3<<6 | 3<<4 | 3<<2 | 3 == 255.
+    count = len(values) // 4
+    if not count:
+        return b""
+    acc = 0
+    for offset, shift in enumerate((6, 4, 2, 0)):
+        acc |= int.from_bytes(values[offset::4], "big") << shift
+    return acc.to_bytes(count, "big")
+
+def dna_decode_bytes(dna: bytes) -> bytes:
+    values = dna.translate(_DECODE_TABLE, _NON_BASES)
+    return _decode_values(values[:len(values) - len(values) % 4])
+
+def dna_encode(data):
     """
-    Encode ascii string to DNA sequence.
-    ASCII -> Binary -> DNA (00=A, 01=C, 10=G, 11=T)
+    Encode text (as UTF-8) or raw bytes to a DNA sequence.
+    Bytes -> 2-bit groups -> DNA (00=A, 01=C, 10=G, 11=T)
     """
-    mapping = {'00': 'A', '01': 'C', '10': 'G', '11': 'T'}
-    binary = ''.join(format(ord(char), '08b') for char in data)
-    dna = []
-    for i in range(0, len(binary), 2):
-        pair = binary[i:i+2]
-        dna.append(mapping.get(pair, ''))
-    return "".join(dna)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return dna_encode_bytes(data).decode("ascii")
 
 def dna_decode(dna: str):
-    rev_mapping = {'A': '00', 'C': '01', 'G': '10', 'T': '11'}
-    binary = []
-    for char in dna:
-        binary.append(rev_mapping.get(char, ''))
-    binary_str = "".join(binary)
-    
-    chars = []
-    for i in range(0, len(binary_str), 8):
-        byte = binary_str[i:i+8]
-        if len(byte) == 8:
-            chars.append(chr(int(byte, 2)))
-    return "".join(chars)
+    return dna_decode_bytes(dna.encode("utf-8")).decode("utf-8", errors="replace")
+
+class DnaStreamDecoder:
+    """
+    Incremental decoder for chunked input; bases that do not complete a byte
+    are carried over to the next chunk.
+    """
+
+    def __init__(self):
+        self._pending = b""
+
+    def update(self, chunk: bytes) -> bytes:
+        values = self._pending + chunk.translate(_DECODE_TABLE, _NON_BASES)
+        usable = len(values) - len(values) % 4
+        self._pending = values[usable:]
+        return _decode_values(values[:usable])
+
+def iter_dna_encode(chunks):
+    for chunk in chunks:
+        yield dna_encode_bytes(chunk)
+
+def iter_dna_decode(chunks):
+    decoder = DnaStreamDecoder()
+    for chunk in chunks:
+        out = decoder.update(chunk)
+        if out:
+            yield out
@@ -1,19 +1,82 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
-from Crypto.Hash import SHA256
+from decouple import config
+from itertools import repeat
+from app.services.cryptography.key_cache import import_rsa_key
+from app.services.hashing.merkle_tree import build_merkle_tree, verify_proof
+from app.utils.executors import get_process_pool, pool_size
+from app.utils.lazy import lazy_import
 import base64
 
+pkcs1_15 = lazy_import("Crypto.Signature.pkcs1_15")
+SHA256 = lazy_import("Crypto.Hash.SHA256")
+
 def sign_data(data: str, private_key_str: str):
-    key = RSA.import_key(private_key_str)
+    key = import_rsa_key(private_key_str)
     h = SHA256.new(data.encode('utf-8'))
     signature = pkcs1_15.new(key).sign(h)
     return base64.b64encode(signature).decode('utf-8')
 
 def verify_signature(data: str, signature: str, public_key_str: str):
-    key = RSA.import_key(public_key_str)
+    key = import_rsa_key(public_key_str)
     h = SHA256.new(data.encode('utf-8'))
     try:
         pkcs1_15.new(key).verify(h, base64.b64decode(signature))
         return True
     except (ValueError, TypeError):
         return False
+
+# Batches are cut into chunks and spread over a process pool; each worker
+# parses the key once per process thanks to the key cache.
+SIGN_WORKERS = config("SIGN_WORKERS", default=0, cast=int) # 0: pool_size() share of the cores
+SIGN_CHUNK_SIZE = config("SIGN_CHUNK_SIZE", default=256, cast=int)
+
+def _sign_chunk(items: list, private_key_str: str):
+    signer = pkcs1_15.new(import_rsa_key(private_key_str))
+    return [
+        base64.b64encode(signer.sign(SHA256.new(data.encode('utf-8')))).decode('utf-8')
+        for data in items
+    ]
+
+def _verify_chunk(pairs: list, public_key_str: str):
+    verifier = pkcs1_15.new(import_rsa_key(public_key_str))
+    results = []
+    for data, signature in pairs:
+        try:
+            verifier.verify(SHA256.new(data.encode('utf-8')), base64.b64decode(signature))
+            results.append(True)
+        except (ValueError, TypeError):
+            results.append(False)
+    return results
+
+def _map_chunks(func, items: list, key_str: str):
+    # Parse once up front so a bad key fails here rather than in every worker
+    import_rsa_key(key_str)
+    chunks = [items[i:i + SIGN_CHUNK_SIZE] for i in range(0, len(items), SIGN_CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        return func(items, key_str)
+    pool = get_process_pool("signing", pool_size(SIGN_WORKERS))
+    return [result for chunk in pool.map(func, chunks, repeat(key_str)) for result in chunk]
+
+def sign_batch(items: list, private_key_str: str):
+    return _map_chunks(_sign_chunk, items, private_key_str)
+
+def verify_batch(pairs: list, public_key_str: str):
+    """
+    pairs: (data, signature) tuples. Returns one bool per pair, in order.
+    """
+    return _map_chunks(_verify_chunk, pairs, public_key_str)
+
+def sign_merkle_batch(items: list, private_key_str: str):
+    """
+    Sign only the Merkle root of the batch; each item is later verified with
+    its inclusion proof plus the single root signature.
+    """
+    tree = build_merkle_tree(items)
+    root_hash = tree.root_hex()
+    proofs = [tree.proof(index) for index in range(len(tree))]
+    return root_hash, sign_data(root_hash, private_key_str), proofs
+
+def verify_merkle_batch(items: list, proofs: list, root_hash: str, root_signature: str, public_key_str: str):
+    if not verify_signature(root_hash, root_signature, public_key_str):
+        return [False] * len(items)
+    root = bytes.fromhex(root_hash)
+    return [verify_proof(data, proof, root) for data, proof in zip(items, proofs)]
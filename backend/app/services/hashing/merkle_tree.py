@@ -1,35 +1,181 @@
 import hashlib
+import struct
+from app.utils.metrics import timed
 
-class MerkleNode:
-    def __init__(self, left, right, value):
-        self.left = left
-        self.right = right
-        self.value = value
+DIGEST_SIZE = 32
 
-    @staticmethod
-    def hash(val):
-        return hashlib.sha256(val.encode('utf-8')).hexdigest()
+# Leaves and interior nodes are hashed with different prefixes so an interior
+# node can never be passed off as a leaf in an inclusion proof.
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
 
-def build_merkle_tree(leaves: list):
-    nodes = [MerkleNode(None, None, MerkleNode.hash(leaf)) for leaf in leaves]
-    
-    if not nodes:
-        return None
-
-    while len(nodes) > 1:
-        temp_nodes = []
-        for i in range(0, len(nodes), 2):
-            left = nodes[i]
-            if i + 1 < len(nodes):
-                right = nodes[i + 1]
-                combined_hash = hashlib.sha256((left.value + right.value).encode('utf-8')).hexdigest()
-                temp_nodes.append(MerkleNode(left, right, combined_hash))
+_NODE_HASHER = hashlib.sha256(NODE_PREFIX)
+_LEAF_COUNT = struct.Struct(">I")
+
+def _to_bytes(leaf):
+    return leaf.encode('utf-8') if isinstance(leaf, str) else leaf
+
+def hash_leaf(leaf) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + _to_bytes(leaf)).digest()
+
+def hash_node(left, right) -> bytes:
+    h = _NODE_HASHER.copy()
+    h.update(left)
+    h.update(right)
+    return h.digest()
+
+def _parent_level(level: bytearray) -> bytearray:
+    # Hash one level into the next in a single pass over the flat digest buffer
+    count = len(level) // DIGEST_SIZE
+    view = memoryview(level)
+    parent = bytearray()
+    for offset in range(0, (count - 1) * DIGEST_SIZE, 2 * DIGEST_SIZE):
+        h = _NODE_HASHER.copy()
+        h.update(view[offset:offset + 2 * DIGEST_SIZE])
+        parent += h.digest()
+    if count % 2:
+        parent += view[(count - 1) * DIGEST_SIZE:] # Odd one out, carry up
+    return parent
+
+class MerkleTree:
+    """
+    Array-backed Merkle tree. Every level is a flat bytearray of 32-byte
+    digests, so interior nodes stay cached between calls and appending or
+    updating a leaf only rehashes its path to the root.
+    """
+    __slots__ = ("_levels",)
+
+    def __init__(self, leaf_hashes: bytes = b""):
+        if len(leaf_hashes) % DIGEST_SIZE:
+            raise ValueError("Leaf hashes must be a multiple of 32 bytes")
+        self._levels = [bytearray(leaf_hashes)]
+        while len(self._levels[-1]) > DIGEST_SIZE:
+            self._levels.append(_parent_level(self._levels[-1]))
+
+    @classmethod
+    def from_leaves(cls, leaves):
+        return cls(b"".join(hash_leaf(leaf) for leaf in leaves))
+
+    def __len__(self):
+        return len(self._levels[0]) // DIGEST_SIZE
+
+    def _node(self, height: int, index: int) -> bytes:
+        offset = index * DIGEST_SIZE
+        return bytes(self._levels[height][offset:offset + DIGEST_SIZE])
+
+    def root(self) -> bytes:
+        return bytes(self._levels[-1])
+
+    def root_hex(self) -> str:
+        return self.root().hex()
+
+    def leaf_hash(self, index: int) -> bytes:
+        return self._node(0, index)
+
+    def append(self, leaf) -> int:
+        index = len(self)
+        self._levels[0] += hash_leaf(leaf)
+        self._rehash_path(index)
+        return index
+
+    def update(self, index: int, leaf):
+        if not 0 <= index < len(self):
+            raise IndexError("Leaf index out of range")
+        offset = index * DIGEST_SIZE
+        self._levels[0][offset:offset + DIGEST_SIZE] = hash_leaf(leaf)
+        self._rehash_path(index)
+
+    def truncate(self, count: int):
+        """
+        Keep the first count leaves. Only the last node of each level can
+        change, so it costs one path rehash.
+        """
+        if not 0 <= count <= len(self):
+            raise IndexError("Leaf count out of range")
+        levels = []
+        size = count
+        for level in self._levels:
+            levels.append(level[:size * DIGEST_SIZE])
+            if size <= 1:
+                break
+            size = (size + 1) // 2
+        self._levels = levels
+        if count:
+            self._rehash_path(count - 1)
+
+    def _rehash_path(self, index: int):
+        height = 0
+        while len(self._levels[height]) > DIGEST_SIZE:
+            count = len(self._levels[height]) // DIGEST_SIZE
+            sibling = index ^ 1
+            if sibling >= count:
+                parent = self._node(height, index) # Odd one out, carry up
+            elif index % 2:
+                parent = hash_node(self._node(height, sibling), self._node(height, index))
+            else:
+                parent = hash_node(self._node(height, index), self._node(height, sibling))
+
+            if height + 1 == len(self._levels):
+                self._levels.append(bytearray())
+            upper = self._levels[height + 1]
+            index //= 2
+            offset = index * DIGEST_SIZE
+            if offset == len(upper):
+                upper += parent
             else:
-                temp_nodes.append(left) # Odd one out, carry up
-        nodes = temp_nodes
-    
-    return nodes[0] # Root
+                upper[offset:offset + DIGEST_SIZE] = parent
+            height += 1
+
+    def proof(self, index: int) -> list:
+        """
+        Inclusion proof for a leaf: (sibling_hash, sibling_is_left) pairs from
+        the leaf up to the root. Carried-up levels contribute no entry.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("Leaf index out of range")
+        path = []
+        for height in range(len(self._levels) - 1):
+            sibling = index ^ 1
+            if sibling < len(self._levels[height]) // DIGEST_SIZE:
+                path.append((self._node(height, sibling), bool(index % 2)))
+            index //= 2
+        return path
+
+    def to_bytes(self) -> bytes:
+        """
+        Leaf count followed by every level, leaves first, so from_bytes
+        restores the tree without hashing.
+        """
+        return _LEAF_COUNT.pack(len(self)) + b"".join(self._levels)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        (size,) = _LEAF_COUNT.unpack_from(data)
+        tree = cls()
+        tree._levels = []
+        offset = _LEAF_COUNT.size
+        while True:
+            end = offset + size * DIGEST_SIZE
+            if end > len(data):
+                raise ValueError("Truncated Merkle tree")
+            tree._levels.append(bytearray(data[offset:end]))
+            offset = end
+            if size <= 1:
+                break
+            size = (size + 1) // 2
+        if offset != len(data):
+            raise ValueError("Trailing bytes after Merkle tree")
+        return tree
+
+def verify_proof(leaf, proof: list, root: bytes) -> bool:
+    node = hash_leaf(leaf)
+    for sibling, sibling_is_left in proof:
+        node = hash_node(sibling, node) if sibling_is_left else hash_node(node, sibling)
+    return node == root
+
+@timed("build_merkle_tree")
+def build_merkle_tree(leaves: list):
+    return MerkleTree.from_leaves(leaves)
 
 def get_merkle_root(leaves: list):
-    root = build_merkle_tree(leaves)
-    return root.value if root else ""
+    return build_merkle_tree(leaves).root_hex()
@@ -0,0 +1,57 @@
+import re
+from sqlalchemy import text
+
+# SQLite FTS5 index over repository name, description and content. The
+# repository's clearance rank is indexed as a token ("r0".."r3") so the
+# Bell-LaPadula read filter is part of the MATCH expression itself and
+# documents above the caller's clearance are never scored or snippeted.
+INDEX_TABLE = "code_search"
+
+CREATE_INDEX_SQL = text(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} "
+    "USING fts5(name, description, content, clearance, tokenize = \"unicode61 tokenchars '_'\")"
+)
+
+UPSERT_SQL = text(
+    f"INSERT OR REPLACE INTO {INDEX_TABLE} (rowid, name, description, content, clearance) "
+    "VALUES (:id, :name, :description, :content, :clearance)"
+)
+
+# bm25 column weights: name, description, content, clearance
+SEARCH_SQL = text(
+    f"SELECT {INDEX_TABLE}.rowid AS id, r.name, r.classification, "
+    f"snippet({INDEX_TABLE}, 2, '<mark>', '</mark>', '…', 16) AS snippet, "
+    f"bm25({INDEX_TABLE}, 10.0, 5.0, 1.0, 0.0) AS score "
+    f"FROM {INDEX_TABLE} JOIN code_repositories r ON r.id = {INDEX_TABLE}.rowid "
+    f"WHERE {INDEX_TABLE} MATCH :match AND (r.compartments & :deny) = 0 "
+    f"ORDER BY score LIMIT :limit"
+)
+
+_TERM = re.compile(r"\w+\*?")
+
+def clearance_token(rank: int) -> str:
+    return f"r{rank}"
+
+def index_params(repo_id: int, name: str, description: str, content: str, rank: int) -> dict:
+    return {
+        "id": repo_id,
+        "name": name,
+        "description": description or "",
+        "content": content,
+        "clearance": clearance_token(rank),
+    }
+
+def match_expression(query: str, user_rank: int):
+    """
+    Turn free text into an FTS5 query: every word must match (a trailing *
+    makes it a prefix match), restricted to clearance tokens <= user_rank.
+    Returns None when the query has no searchable words.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    words = " AND ".join(
+        f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms
+    )
+    levels = " OR ".join(clearance_token(rank) for rank in range(user_rank + 1))
+    return f"{{name description content}}: ({words}) AND clearance: ({levels})"
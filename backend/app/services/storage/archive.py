@@ -0,0 +1,253 @@
+import io
+import tarfile
+from itertools import islice
+import orjson
+from decouple import config
+from sqlalchemy import insert, select
+from app.database import engine
+from app.models.code_repository import CodeRepository
+from app.models.repository_version import RepositoryVersion
+from app.models.user import ClearanceLevel
+from app.services.authorization.bell_lapadula import clearance_rank
+from app.services.authorization.policy import compartment_mask, compartment_names
+from app.services.search.code_index import UPSERT_SQL, index_params
+from app.services.storage.chunk_store import content_tree, read_content, write_content
+from app.services.storage.version_store import make_snapshot
+from app.utils.executors import get_process_pool, pool_size
+
+# Bulk import/export of repositories as NDJSON (one JSON object per line) or
+# tar (one file per repository, metadata in PAX headers). Both directions
+# stream: records are read, checked, hashed and inserted one batch at a time,
+# each batch in a single transaction, and exports come off a server-side cursor.
+IMPORT_BATCH_SIZE = config("IMPORT_BATCH_SIZE", default=500, cast=int)
+IMPORT_WORKERS = config("IMPORT_WORKERS", default=0, cast=int) # 0: pool_size() share of the cores
+EXPORT_BATCH_SIZE = config("EXPORT_BATCH_SIZE", default=200, cast=int)
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ("ndjson", "tar")
+PAX_PREFIX = "devvault."
+
+def iter_ndjson_records(fileobj):
+    for line in fileobj:
+        if line.strip():
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON: {e}")
+
+def iter_tar_records(fileobj):
+    # "r|*" reads the archive as a stream, without seeking
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            meta = {key[len(PAX_PREFIX):]: value for key, value in member.pax_headers.items() if key.startswith(PAX_PREFIX)}
+            try:
+                content = tar.extractfile(member).read().decode("utf-8")
+            except UnicodeDecodeError:
+                yield ValueError(f"{member.name}: content is not UTF-8")
+                continue
+            yield {
+                "name": meta.get("name", member.name),
+                "description": meta.get("description", ""),
+                "classification": meta.get("classification", ClearanceLevel.UNCLASSIFIED.value),
+                "compartments": [c for c in meta.get("compartments", "").split(",") if c],
+                "content": content,
+            }
+
+def iter_records(fileobj, fmt: str):
+    if fmt == "tar":
+        return iter_tar_records(fileobj)
+    return iter_ndjson_records(fileobj)
+
+def _prepare_import(content: str):
+    # Runs in the import worker pool: chunk writes, hashing and the snapshot
+    manifest = write_content(content)
+    tree = content_tree(manifest)
+    return manifest, tree.root_hex(), tree.to_bytes(), make_snapshot(content), len(content.encode("utf-8"))
+
+def _map_prepare(contents: list) -> list:
+    workers = pool_size(IMPORT_WORKERS)
+    if len(contents) < 8 or workers <= 1:
+        return [_prepare_import(content) for content in contents]
+    pool = get_process_pool("import", workers)
+    return list(pool.map(_prepare_import, contents, chunksize=max(1, len(contents) // (workers * 4))))
+
+def _validate(record) -> dict:
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict) or not isinstance(record.get("name"), str) or not isinstance(record.get("content"), str):
+        raise ValueError("Record needs string name and content")
+    classification = record.get("classification") or ClearanceLevel.UNCLASSIFIED.value
+    compartments = record.get("compartments") or []
+    if not isinstance(classification, str) or not isinstance(compartments, list):
+        raise ValueError("classification must be a string and compartments a list")
+    return {
+        "name": record["name"],
+        "description": str(record.get("description") or ""),
+        "classification": classification,
+        "classification_rank": clearance_rank(classification),
+        "compartments": compartment_mask(compartments),
+        "content": record["content"],
+    }
+
+def _insert_batch(conn, rows: list, prepared: list, author_id: int):
+    repo_ids = conn.execute(
+        insert(CodeRepository).returning(CodeRepository.id, sort_by_parameter_order=True),
+        [
+            {
+                "name": row["name"],
+                "description": row["description"],
+                "classification": row["classification"],
+                "classification_rank": row["classification_rank"],
+                "compartments": row["compartments"],
+                "owner_id": author_id,
+                "content_manifest": manifest,
+                "integrity_root": root,
+                "integrity_tree": tree,
+                "head_version": 1,
+            }
+            for row, (manifest, root, tree, _, _) in zip(rows, prepared)
+        ],
+    ).scalars().all()
+    conn.execute(insert(RepositoryVersion), [
+        {
+            "repo_id": repo_id,
+            "version": 1,
+            "parent_version": None,
+            "is_snapshot": True,
+            "data": snapshot,
+            "size": size,
+            "integrity_root": root,
+            "author_id": author_id,
+        }
+        for repo_id, (_, root, _, snapshot, size) in zip(repo_ids, prepared)
+    ])
+    if conn.dialect.name == "sqlite":
+        conn.execute(UPSERT_SQL, [
+            index_params(repo_id, row["name"], row["description"], row["content"], row["classification_rank"])
+            for repo_id, row in zip(repo_ids, rows)
+        ])
+    return repo_ids
+
+def import_records(records, principal, batch_size: int = None) -> dict:
+    """
+    Import repositories owned by principal. Records failing validation or the
+    BLP write check are skipped and reported; the rest are committed a batch
+    at a time, so an interrupted import keeps every completed batch.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    imported = 0
+    errors = []
+    position = 0
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        rows = []
+        for record in batch:
+            try:
+                rows.append((position, _validate(record)))
+            except (TypeError, ValueError) as e:
+                errors.append({"record": position, "error": str(e)})
+            position += 1
+
+        decisions = principal.policy.check_many((row["classification_rank"], row["compartments"]) for _, row in rows)
+        allowed = []
+        for (index, row), (_, writable) in zip(rows, decisions):
+            if writable:
+                allowed.append(row)
+            else:
+                errors.append({"record": index, "name": row["name"], "error": "Security Violation: No Write Down"})
+        if allowed:
+            prepared = _map_prepare([row["content"] for row in allowed])
+            with engine.begin() as conn:
+                _insert_batch(conn, allowed, prepared, principal.id)
+            imported += len(allowed)
+
+    return {
+        "imported": imported,
+        "rejected": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+
+def import_archive(fileobj, fmt: str, principal, batch_size: int = None) -> dict:
+    return import_records(iter_records(fileobj, fmt), principal, batch_size)
+
+def _export_rows(principal):
+    # Server-side cursor: rows are fetched a batch at a time. Unreadable rows
+    # are filtered out in SQL and never have their chunks read.
+    readable = principal.policy.read_clause(CodeRepository.classification_rank, CodeRepository.compartments)
+    query = (
+        select(
+            CodeRepository.id,
+            CodeRepository.name,
+            CodeRepository.description,
+            CodeRepository.classification,
+            CodeRepository.compartments,
+            CodeRepository.integrity_root,
+            CodeRepository.content_manifest,
+        )
+        .where(readable)
+        .order_by(CodeRepository.id)
+    )
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(query)
+        for rows in result.partitions():
+            for row in rows:
+                yield row, read_content(row.content_manifest)
+
+def _export_metadata(row) -> dict:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "description": row.description or "",
+        "classification": row.classification,
+        "compartments": compartment_names(row.compartments),
+        "integrity_root": row.integrity_root,
+    }
+
+def iter_ndjson_export(principal):
+    for row, content in _export_rows(principal):
+        yield orjson.dumps({**_export_metadata(row), "content": content}) + b"\n"
+
+class _Drain(io.RawIOBase):
+    # Write target for a streaming tarfile; the generator empties it after each member
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def take(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def iter_tar_export(principal):
+    drain = _Drain()
+    with tarfile.open(fileobj=drain, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for row, content in _export_rows(principal):
+            meta = _export_metadata(row)
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(f"{row.id:08d}-{''.join(c if c.isalnum() or c in '._-' else '_' for c in row.name)}")
+            info.size = len(data)
+            info.mode = 0o644
+            info.pax_headers = {
+                PAX_PREFIX + key: str(value)
+                for key, value in {**meta, "compartments": ",".join(meta["compartments"])}.items()
+                if value is not None
+            }
+            tar.addfile(info, io.BytesIO(data))
+            yield drain.take()
+    yield drain.take() # End-of-archive blocks written on close
+
+def iter_export(principal, fmt: str):
+    if fmt == "tar":
+        return iter_tar_export(principal)
+    return iter_ndjson_export(principal)
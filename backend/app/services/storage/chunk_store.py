@@ -0,0 +1,240 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+import zstandard
+from contextlib import contextmanager
+from decouple import config
+from app.services.hashing.merkle_tree import MerkleTree
+
+# Content-addressed store: every chunk lives at <root>/<sha256[:2]>/<sha256[2:]>,
+# so identical chunks are shared across repositories and versions.
+CHUNK_STORE_DIR = config("CHUNK_STORE_DIR", default="./chunks")
+CHUNK_SIZE = config("CHUNK_SIZE", default=64 * 1024, cast=int)
+
+# Chunks are stored as zstd frames when that saves space, raw otherwise. The
+# file name stays the sha256 of the uncompressed bytes, so dedup, manifests and
+# integrity roots do not change and older raw chunks remain readable.
+# CHUNK_ZSTD_LEVEL=0 turns compression off for new chunks. CHUNK_ZSTD_DICT
+# points at a dictionary from train_dictionary(); small chunks of similar code
+# compress much better with one. Keep the file: chunks written with it cannot
+# be read without it.
+CHUNK_ZSTD_LEVEL = config("CHUNK_ZSTD_LEVEL", default=3, cast=int)
+CHUNK_ZSTD_DICT = config("CHUNK_ZSTD_DICT", default="")
+# Chunks are hashed when written. CHUNK_VERIFY_READS also checks each one
+# against its name on every read, for catching disk corruption.
+CHUNK_VERIFY_READS = config("CHUNK_VERIFY_READS", default=False, cast=bool)
+# Unreferenced chunks are only collected once they have not been written or
+# reused for this many seconds, so a write whose manifest has not committed
+# yet keeps its chunks.
+CHUNK_GC_GRACE = config("CHUNK_GC_GRACE", default=3600, cast=int)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def _load_dictionary():
+    if not CHUNK_ZSTD_DICT:
+        return None
+    with open(CHUNK_ZSTD_DICT, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+_dictionary = _load_dictionary()
+# zstd contexts are not thread-safe; the threadpool gets one set per thread
+_codecs = threading.local()
+
+def _compressor():
+    if not hasattr(_codecs, "compressor"):
+        _codecs.compressor = zstandard.ZstdCompressor(level=CHUNK_ZSTD_LEVEL, dict_data=_dictionary)
+    return _codecs.compressor
+
+def _decompressor(dict_id: int):
+    if not hasattr(_codecs, "decompressors"):
+        _codecs.decompressors = {0: zstandard.ZstdDecompressor()}
+        if _dictionary is not None:
+            _codecs.decompressors[_dictionary.dict_id()] = zstandard.ZstdDecompressor(dict_data=_dictionary)
+    try:
+        return _codecs.decompressors[dict_id]
+    except KeyError:
+        raise ValueError(f"Chunk needs zstd dictionary {dict_id}, set CHUNK_ZSTD_DICT") from None
+
+def _encode_chunk(data) -> bytes:
+    # Whatever is stored starting with the zstd magic is a frame, so reads
+    # tell the two apart without hashing. Content chunks are UTF-8, which
+    # never contains the magic's 28 b5 pair, so raw ones never start with it.
+    framed = data[:4] == ZSTD_MAGIC
+    if CHUNK_ZSTD_LEVEL > 0 or framed:
+        compressed = _compressor().compress(data)
+        if len(compressed) < len(data) or framed:
+            return compressed
+    return bytes(data)
+
+def _decode_chunk(stored, digest: str):
+    if stored[:4] == ZSTD_MAGIC:
+        stored = _decompressor(zstandard.get_frame_parameters(stored).dict_id).decompress(stored)
+    if CHUNK_VERIFY_READS and hashlib.sha256(stored).hexdigest() != digest:
+        raise ValueError(f"Chunk {digest} is corrupt")
+    return stored
+
+def _chunk_path(digest: str) -> str:
+    return os.path.join(CHUNK_STORE_DIR, digest[:2], digest[2:])
+
+def put_chunk(data) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(digest)
+    try:
+        os.utime(path) # Already stored: mark it in use for collect_garbage
+        return digest
+    except FileNotFoundError:
+        pass
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temp file and rename so readers never see a partial chunk
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_encode_chunk(data))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return digest
+
+def write_content(content: str) -> str:
+    """
+    Split content into fixed-size chunks, store each one and return the manifest
+    (JSON with total size and ordered chunk digests) to keep on the row.
+    """
+    data = memoryview(content.encode("utf-8"))
+    chunks = [put_chunk(data[i:i + CHUNK_SIZE]) for i in range(0, len(data), CHUNK_SIZE)]
+    return json.dumps({"size": len(data), "chunks": chunks})
+
+def manifest_digests(manifest: str) -> list:
+    return json.loads(manifest)["chunks"]
+
+def manifest_size(manifest: str) -> int:
+    return json.loads(manifest)["size"]
+
+def content_tree(manifest: str) -> MerkleTree:
+    """
+    Merkle tree over the chunk digests of a manifest; its root is the
+    integrity root kept on the repository row.
+    """
+    return MerkleTree.from_leaves(bytes.fromhex(digest) for digest in manifest_digests(manifest))
+
+def update_content_tree(tree_data: bytes, old_manifest: str, manifest: str) -> MerkleTree:
+    """
+    Tree for manifest, from the saved tree of old_manifest: only leaves whose
+    chunk changed are rehashed, with their paths. Falls back to a full build
+    when there is no saved tree or most chunks changed (an insertion near the
+    start shifts every later chunk).
+    """
+    if not tree_data or not old_manifest:
+        return content_tree(manifest)
+    old, new = manifest_digests(old_manifest), manifest_digests(manifest)
+    changed = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+    if 2 * (len(changed) + abs(len(new) - len(old))) > len(new):
+        return content_tree(manifest)
+    tree = MerkleTree.from_bytes(tree_data)
+    if len(tree) != len(old):
+        return content_tree(manifest) # Saved for another manifest
+    if len(new) < len(old):
+        tree.truncate(len(new))
+    for i in changed:
+        tree.update(i, bytes.fromhex(new[i]))
+    for digest in new[len(old):]:
+        tree.append(bytes.fromhex(digest))
+    return tree
+
+@contextmanager
+def open_chunk(digest: str):
+    """
+    Chunk contents, valid inside the block: a memoryview of the mapped file
+    for raw chunks, decompressed bytes otherwise. The mapping is closed on exit.
+    """
+    with open(_chunk_path(digest), "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(m)
+    try:
+        yield _decode_chunk(view, digest)
+    finally:
+        view.release()
+        try:
+            m.close()
+        except BufferError:
+            pass # A socket buffer still holds a slice; unmapped when it is sent
+
+def read_chunk(digest: str) -> bytes:
+    with open_chunk(digest) as data:
+        return bytes(data)
+
+def iter_chunks(manifest: str):
+    # Each chunk is valid until the next one is requested, which is how
+    # StreamingResponse consumes it
+    for digest in manifest_digests(manifest):
+        with open_chunk(digest) as data:
+            yield data
+
+def read_content(manifest: str) -> str:
+    if not manifest:
+        return ""
+    # Chunks are copied once, straight from their mappings into the result
+    content = bytearray(manifest_size(manifest))
+    offset = 0
+    for digest in manifest_digests(manifest):
+        with open_chunk(digest) as data:
+            content[offset:offset + len(data)] = data
+            offset += len(data)
+    return content.decode("utf-8")
+
+def _stored_digests():
+    for prefix in sorted(os.listdir(CHUNK_STORE_DIR)):
+        directory = os.path.join(CHUNK_STORE_DIR, prefix)
+        if len(prefix) == 2 and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if len(name) == 62: # Skips temp files from interrupted writes
+                    yield prefix + name
+
+def collect_garbage(live_digests, grace: float = CHUNK_GC_GRACE) -> int:
+    """
+    Mark and sweep: delete stored chunks not in live_digests (the digests of
+    every current manifest) and not written or reused within grace seconds,
+    along with temp files left by interrupted writes. Returns the number of
+    files deleted.
+    """
+    live = set(live_digests)
+    cutoff = time.time() - grace
+    removed = 0
+    for prefix in sorted(os.listdir(CHUNK_STORE_DIR)):
+        directory = os.path.join(CHUNK_STORE_DIR, prefix)
+        if len(prefix) != 2 or not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if prefix + name in live:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+def train_dictionary(output_path: str, dict_size: int = 112640, max_samples: int = 10000) -> int:
+    """
+    Train a zstd dictionary on stored chunks and write it to output_path for
+    use as CHUNK_ZSTD_DICT. Only chunks written after it is configured use it.
+    Returns the dictionary id.
+    """
+    samples = []
+    for digest in _stored_digests():
+        samples.append(read_chunk(digest))
+        if len(samples) >= max_samples:
+            break
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    with open(output_path, "wb") as f:
+        f.write(dictionary.as_bytes())
+    return dictionary.dict_id()
@@ -0,0 +1,72 @@
+import difflib
+import json
+import zlib
+from decouple import config
+from app.utils.cache import LRUCache
+
+# Every VERSION_SNAPSHOT_INTERVAL-th revision is stored in full, the rest as
+# line deltas against their parent, so materializing any revision replays at
+# most that many deltas. Recently materialized revisions are kept in an LRU.
+VERSION_SNAPSHOT_INTERVAL = config("VERSION_SNAPSHOT_INTERVAL", default=16, cast=int)
+VERSION_CACHE_SIZE = config("VERSION_CACHE_SIZE", default=128, cast=int)
+
+_materialized = LRUCache(maxsize=VERSION_CACHE_SIZE)
+
+def is_snapshot_version(version: int) -> bool:
+    return (version - 1) % VERSION_SNAPSHOT_INTERVAL == 0
+
+def make_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"))
+
+def make_delta(base: str, target: str) -> bytes:
+    """
+    Line delta from base to target: a list of [start, end] ranges copied from
+    base and strings of inserted text, in output order.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+def apply_delta(base: str, delta: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    out = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, list):
+            out.extend(base_lines[op[0]:op[1]])
+        else:
+            out.append(op)
+    return "".join(out)
+
+def cached_version(repo_id: int, version: int):
+    return _materialized.get((repo_id, version))
+
+def remember_version(repo_id: int, version: int, content: str):
+    _materialized.set((repo_id, version), content)
+
+def materialize(repo_id: int, chain: list, base: str = None) -> str:
+    """
+    Replay a chain of (version, is_snapshot, data) rows in ascending order.
+    The chain starts either at a snapshot or just after a cached `base`.
+    """
+    content = base
+    for version, is_snapshot, data in chain:
+        if is_snapshot:
+            content = zlib.decompress(data).decode("utf-8")
+        else:
+            content = apply_delta(content, data)
+    if chain:
+        remember_version(repo_id, chain[-1][0], content)
+    return content
+
+def unified_diff(old: str, new: str, old_label: str, new_label: str) -> str:
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=old_label, tofile=new_label,
+    ))
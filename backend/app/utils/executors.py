@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from decouple import config
+
+# Named process pools shared across the app, created on first use and shut
+# down together from the app lifespan. Workers are spawned rather than forked
+# so they never inherit the server's threads or open database connections.
+_pools = {}
+_lock = threading.Lock()
+
+def pool_size(configured: int = 0) -> int:
+    """
+    configured if set, else this process's share of the cores. Every server
+    worker has its own pools, so the launcher exports WEB_CONCURRENCY and
+    N workers split the machine instead of each sizing pools for all of it.
+    Read at call time, after the launcher has set it.
+    """
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // max(1, config("WEB_CONCURRENCY", default=1, cast=int)))
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[name] = pool
+        return pool
+
+def shutdown_pools(wait: bool = True):
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
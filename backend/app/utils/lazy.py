@@ -0,0 +1,40 @@
+import importlib.util
+import sys
+import threading
+
+# Heavy optional-path modules (PyCryptodome, qrcode/PIL, pyotp, jose) are
+# bound at import time but only executed on first attribute access, so the
+# API process starts without paying for them. warm_up() loads them all, for
+# launchers that would rather pay up front (before forking workers, say).
+_registered = {}
+_lock = threading.Lock()
+
+def lazy_import(name: str):
+    """
+    Module object for name whose body runs on first attribute access.
+    Parent packages are imported normally.
+    """
+    with _lock:
+        module = sys.modules.get(name) or _registered.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        _registered[name] = module
+        return module
+
+def warm_up() -> list:
+    """
+    Load every module registered with lazy_import. Returns their names.
+    """
+    with _lock:
+        modules = list(_registered.values())
+    for module in modules:
+        getattr(module, "__name__") # Any attribute access runs the module body
+    return [module.__name__ for module in modules]
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads at a fixed interval while running.
+    Output is the collapsed-stack format ("frame;frame;frame count") read by
+    flamegraph.pl and speedscope. Covers both the event loop and threadpool
+    workers, so blocking work offloaded by a handler shows up too.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Only signals, so it is safe on the event loop; join() before
+        # reading samples
+        self._stop.set()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    thread = threading._active.get(thread_id)
+                    names[thread_id] = thread.name if thread else str(thread_id)
+                stack.append(names[thread_id])
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+def dump_collapsed(directory: str, label: str, sampler: StackSampler) -> str:
+    # Blocking: waits for the sampler thread to finish, then writes the file
+    sampler.join()
+    os.makedirs(directory, exist_ok=True)
+    safe = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}-{os.getpid()}.folded")
+    with open(path, "w") as f:
+        f.write(sampler.collapsed())
+    return path
+
+def import_times(module: str = "app.main") -> list:
+    """
+    (name, self seconds, cumulative seconds, depth) for every module loaded by
+    importing module in a fresh interpreter, in -X importtime order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6, depth))
+    return rows
+
+def import_report(rows: list, top: int = 20) -> str:
+    """
+    Import cost per top-level package and the slowest individual modules.
+    """
+    by_package = Counter()
+    for name, own, _, _ in rows:
+        by_package[name.split(".")[0]] += own
+    total = sum(own for _, own, _, _ in rows)
+    lines = [f"total {total * 1000:9.1f} ms  ({len(rows)} modules)", "", "by package (self time):"]
+    lines += [f"  {own * 1000:9.1f} ms  {name}" for name, own in by_package.most_common(top)]
+    lines += ["", "slowest modules (self / cumulative):"]
+    for name, own, cumulative, _ in sorted(rows, key=lambda row: row[1], reverse=True)[:top]:
+        lines.append(f"  {own * 1000:9.1f} / {cumulative * 1000:9.1f} ms  {name}")
+    return "\n".join(lines) + "\n"
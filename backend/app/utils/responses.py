@@ -0,0 +1,24 @@
+import orjson
+from starlette.responses import JSONResponse, StreamingResponse
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON rendered by orjson. Return it directly from a route with plain
+    dicts/lists to skip FastAPI's jsonable_encoder pass as well.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for bodies generated while the request body is still
+    being read. The stock class listens for disconnects on `receive` in a
+    parallel task, which would steal request body chunks from request.stream();
+    here the body iterator is the only reader, and it sees the disconnect itself.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
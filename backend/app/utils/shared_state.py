@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from decouple import config
+from starlette.concurrency import run_in_threadpool
+from app.utils.cache import LRUCache
+
+# Small key/value primitives for state that has to be consistent across
+# requests: rate-limit buckets and one-time markers. The in-memory backend is
+# per process. Multi-worker deployments share it through the state server
+# started by `app.cli serve`, or through any Redis-compatible server given as
+# REDIS_URL.
+SHARED_STATE_SIZE = config("SHARED_STATE_SIZE", default=100_000, cast=int)
+
+class MemoryState:
+    """
+    The state itself, guarded by one lock. Used directly by MemoryBackend and
+    served to every worker by the shared state server.
+    """
+
+    def __init__(self, maxsize: int = SHARED_STATE_SIZE):
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._markers = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def take_token(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        """
+        Token bucket holding up to capacity tokens, refilled at rate per
+        second. Takes cost tokens and returns 0, or returns the seconds until
+        they are available; a negative cost gives tokens back. Idle buckets
+        expire once they would be full again.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + (now - last) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens = min(capacity, tokens - cost)
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets.set(key, (tokens, now), ttl=capacity / rate)
+        return wait
+
+    def add_once(self, key: str, ttl: float) -> bool:
+        """
+        Set a marker that expires after ttl seconds; False if it was already set.
+        """
+        with self._lock:
+            if self._markers.get(key) is not None:
+                return False
+            self._markers.set(key, True, ttl=ttl)
+        return True
+
+class MemoryBackend:
+    # Per process: right for a single worker
+    def __init__(self):
+        self._state = MemoryState()
+
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        return self._state.take_token(key, capacity, rate, cost)
+
+    async def add_once(self, key: str, ttl: float) -> bool:
+        return self._state.add_once(key, ttl)
+
+# Shared state server: one MemoryState in a separate process, reached by the
+# workers of one host over a Unix socket. The launcher starts it and hands
+# the address and key to workers through SHARED_STATE_ADDRESS/AUTHKEY.
+_server_state = None
+
+def _get_server_state():
+    global _server_state
+    if _server_state is None:
+        _server_state = MemoryState()
+    return _server_state
+
+class StateManager(BaseManager):
+    pass
+
+StateManager.register("get_state", callable=_get_server_state)
+
+def start_state_server(address: str):
+    """
+    Start the shared state server and export its address and key to this
+    process's environment, so workers started afterwards connect to it.
+    """
+    authkey = secrets.token_bytes(32)
+    manager = StateManager(address=address, authkey=authkey, ctx=multiprocessing.get_context("spawn"))
+    manager.start()
+    os.environ["SHARED_STATE_ADDRESS"] = address
+    os.environ["SHARED_STATE_AUTHKEY"] = authkey.hex()
+    return manager
+
+class ManagerBackend:
+    def __init__(self, address: str, authkey: bytes):
+        manager = StateManager(address=address, authkey=authkey)
+        manager.connect()
+        self._state = manager.get_state()
+
+    # Proxy calls are blocking socket round trips; proxies keep one
+    # connection per thread, so they are safe to call from the threadpool
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        return await run_in_threadpool(self._state.take_token, key, capacity, rate, cost)
+
+    async def add_once(self, key: str, ttl: float) -> bool:
+        return await run_in_threadpool(self._state.add_once, key, ttl)
+
+# Same bucket arithmetic as MemoryState, atomic on the server
+_TAKE_TOKEN_LUA = """
+local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= cost then tokens = math.min(capacity, tokens - cost) else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+class RedisBackend:
+    def __init__(self, url: str):
+        import redis.asyncio as redis # Optional dependency, only needed with REDIS_URL
+        self._client = redis.from_url(url)
+        self._take_token = self._client.register_script(_TAKE_TOKEN_LUA)
+
+    async def take_token(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        return float(await self._take_token(keys=[key], args=[capacity, rate, time.time(), cost]))
+
+    async def add_once(self, key: str, ttl: float) -> bool:
+        return bool(await self._client.set(key, 1, nx=True, px=max(1, int(ttl * 1000))))
+
+_backend = None
+
+def get_state_backend():
+    # Read at first use, not import: the launcher sets these after preloading
+    global _backend
+    if _backend is None:
+        redis_url = config("REDIS_URL", default="")
+        address = config("SHARED_STATE_ADDRESS", default="")
+        if redis_url:
+            _backend = RedisBackend(redis_url)
+        elif address:
+            _backend = ManagerBackend(address, bytes.fromhex(config("SHARED_STATE_AUTHKEY")))
+        else:
+            _backend = MemoryBackend()
+    return _backend
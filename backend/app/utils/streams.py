@@ -0,0 +1,28 @@
+import io
+from anyio.from_thread import run as run_from_thread
+
+class RequestBodyReader(io.RawIOBase):
+    """
+    Blocking file object over an async byte stream such as request.stream(),
+    for parsers running in the threadpool (tarfile, line iteration). Each read
+    that runs out of data waits on the event loop for the next chunk.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+        self._pending = memoryview(b"")
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._done:
+            try:
+                self._pending = memoryview(run_from_thread(self._chunks.__anext__))
+            except StopAsyncIteration:
+                self._done = True
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
@@ -0,0 +1,298 @@
+"""
+Benchmarks for the service functions and the HTTP layer.
+
+    python -m benchmarks.run                          # everything, JSON to stdout
+    python -m benchmarks.run --only service -o out.json
+    python -m benchmarks.run --only startup           # launch to first response
+    python -m benchmarks.run --compare benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.run --save benchmarks/baseline.json
+
+Runs against a throwaway database and chunk store, never ./devvault.db.
+Compare results only between runs on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+def _isolate():
+    # Must run before anything under app/ is imported: config is read at import
+    workdir = tempfile.mkdtemp(prefix="devvault-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ.setdefault("CHUNK_STORE_DIR", os.path.join(workdir, "chunks"))
+    # The login benchmark is one user from one address: it must time bcrypt, not 429s
+    for name in (
+        "LOGIN_RATE_CAPACITY", "LOGIN_RATE_PER_SECOND", "LOGIN_ADDR_RATE_CAPACITY", "LOGIN_ADDR_RATE_PER_SECOND",
+        "OTP_RATE_CAPACITY", "OTP_RATE_PER_SECOND",
+    ):
+        os.environ.setdefault(name, "1000000")
+    return workdir
+
+KIB = 1024
+MIB = 1024 * KIB
+
+def measure(func, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """
+    Per-call seconds over `repeat` rounds. Each round calls func enough times
+    to last about min_time, so fast functions are not lost in timer noise.
+    """
+    func() # Warm-up: caches, lazy tables, first-call imports
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= 1 << 20:
+            break
+        calls *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    rounds = [elapsed / calls]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        rounds.append((time.perf_counter() - start) / calls)
+    return {
+        "median": statistics.median(rounds),
+        "min": min(rounds),
+        "max": max(rounds),
+        "calls_per_round": calls,
+        "rounds": repeat,
+    }
+
+def _payload(size: int) -> str:
+    # Repetitive ASCII, like source code; random text would be unrealistic
+    line = "def handler(request):  return process(request.body)  # vault\n"
+    return (line * (size // len(line) + 1))[:size]
+
+def service_benchmarks(quick: bool = False) -> dict:
+    from app.services.authentication.password_auth import BCRYPT_ROUNDS, get_password_hash
+    from app.services.cryptography.hybrid_encryption import decrypt_message, encrypt_message, generate_key_pair
+    from app.services.cryptography.threshold_crypto import reconstruct_secret, split_secret
+    from app.services.encoding.dna_encoding import dna_decode, dna_encode
+    from app.services.hashing.digital_signature import sign_data, verify_signature
+    from app.services.hashing.merkle_tree import build_merkle_tree
+
+    sizes = [KIB, 64 * KIB] if quick else [KIB, 64 * KIB, MIB]
+    private_key, public_key = generate_key_pair()
+    results = {}
+
+    for size in sizes:
+        data = _payload(size)
+        dna = dna_encode(data)
+        results[f"dna_encode[{size}]"] = measure(lambda: dna_encode(data))
+        results[f"dna_decode[{size}]"] = measure(lambda: dna_decode(dna))
+
+        encrypted = encrypt_message(data, public_key)
+        results[f"encrypt_message[{size}]"] = measure(lambda: encrypt_message(data, public_key))
+        results[f"decrypt_message[{size}]"] = measure(lambda: decrypt_message(encrypted, private_key))
+
+        signature = sign_data(data, private_key)
+        results[f"sign_data[{size}]"] = measure(lambda: sign_data(data, private_key))
+        results[f"verify_signature[{size}]"] = measure(lambda: verify_signature(data, signature, public_key))
+
+    for size in [32, KIB] if quick else [32, KIB, 64 * KIB]:
+        secret = _payload(size)
+        shares = split_secret(secret, 5, 3)
+        results[f"split_secret[{size},n=5,k=3]"] = measure(lambda: split_secret(secret, 5, 3))
+        results[f"reconstruct_secret[{size},k=3]"] = measure(lambda: reconstruct_secret(shares[:3]))
+
+    for count in [16, 1024] if quick else [16, 1024, 16384]:
+        leaves = [f"leaf-{i}" for i in range(count)]
+        results[f"build_merkle_tree[{count}]"] = measure(lambda: build_merkle_tree(leaves))
+
+    # Seconds per hash, so one round is plenty
+    results[f"get_password_hash[rounds={BCRYPT_ROUNDS}]"] = measure(
+        lambda: get_password_hash("correct horse battery staple"), min_time=0, repeat=3
+    )
+    return results
+
+def _latency_summary(latencies: list, wall: float) -> dict:
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+    return {
+        "median": statistics.median(latencies) if latencies else 0.0,
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "max": latencies[-1] if latencies else 0.0,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+    }
+
+async def _load(client, make_request, total: int, concurrency: int) -> dict:
+    latencies = []
+    failures = {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await make_request(client)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                failures[response.status_code] = failures.get(response.status_code, 0) + 1
+            else:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    # Error responses would be timed as if they were real work
+    if failures:
+        raise RuntimeError(f"{sum(failures.values())} of {total} requests failed, by status: {failures}")
+    return _latency_summary(latencies, wall)
+
+async def http_benchmarks(concurrency: list, requests: int, repos: int) -> dict:
+    import httpx
+    from app.database import engine
+    from app.main import app
+    from app.migrations import run_migrations
+    from app.models.user import ClearanceLevel
+
+    run_migrations(engine)
+
+    user = {"username": "bench", "email": "bench@example.com", "password": "bench-password", "role": "Developer"}
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/auth/register", json=user)
+        if response.status_code == 400: # Reused database
+            response = await client.post("/api/auth/login", json={"username": user["username"], "password": user["password"]})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        # Unclassified author: may create at every level, reads most rows redacted.
+        # A failed setup would leave the listings timing a different dataset.
+        levels = [level.value for level in ClearanceLevel]
+        for i in range(repos):
+            response = await client.post("/api/code/", headers=headers, json={
+                "name": f"repo-{i}",
+                "description": "benchmark repository",
+                "classification": levels[i % len(levels)],
+                "content": _payload(4 * KIB),
+            })
+            response.raise_for_status()
+
+        login = {"username": user["username"], "password": user["password"]}
+        for c in concurrency:
+            results[f"GET /api/code/[repos={repos},c={c}]"] = await _load(
+                client, lambda cl: cl.get("/api/code/", headers=headers), requests, c
+            )
+            results[f"GET /api/code/?metadata_only[repos={repos},c={c}]"] = await _load(
+                client, lambda cl: cl.get("/api/code/", headers=headers, params={"metadata_only": True}), requests, c
+            )
+            # bcrypt bound: far fewer requests
+            results[f"POST /api/auth/login[c={c}]"] = await _load(
+                client, lambda cl: cl.post("/api/auth/login", json=login), max(c, requests // 10), c
+            )
+    return results
+
+# Launch to first response in a fresh interpreter, the cost a new container
+# or worker pays before serving; lazily imported modules stay unloaded
+_FIRST_REQUEST = """
+import asyncio, time, httpx
+from app.main import app
+async def first():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        (await client.get("/")).raise_for_status()
+asyncio.run(first())
+print(time.time())
+"""
+
+def startup_benchmarks(repeat: int = 5) -> dict:
+    rounds = []
+    for _ in range(repeat):
+        launched = time.time()
+        output = subprocess.run([sys.executable, "-c", _FIRST_REQUEST], capture_output=True, text=True, check=True).stdout
+        rounds.append(float(output.split()[-1]) - launched)
+    return {
+        "first_request[cold]": {
+            "median": statistics.median(rounds),
+            "min": min(rounds),
+            "max": max(rounds),
+            "rounds": repeat,
+        }
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Rows of (name, baseline median, current median, ratio, regressed)."""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median"):
+            continue
+        ratio = result["median"] / base["median"]
+        rows.append((name, base["median"], result["median"], ratio, ratio > 1 + threshold))
+    return rows
+
+def _print_comparison(rows: list, threshold: float):
+    width = max((len(row[0]) for row in rows), default=10)
+    print(f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'ratio':>7}", file=sys.stderr)
+    for name, base, current, ratio, regressed in rows:
+        flag = f"  REGRESSION (>{threshold:.0%})" if regressed else ""
+        print(f"{name:<{width}}  {base * 1000:>10.3f}ms  {current * 1000:>10.3f}ms  {ratio:>6.2f}x{flag}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DevVault benchmarks")
+    parser.add_argument("--only", choices=["service", "http", "startup"], help="Run one group only")
+    parser.add_argument("--quick", action="store_true", help="Smaller size sweeps")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated HTTP concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per HTTP benchmark")
+    parser.add_argument("--repos", type=int, default=100, help="Repositories created for the listing benchmark")
+    parser.add_argument("-o", "--output", help="Write results JSON here (default stdout)")
+    parser.add_argument("--save", help="Also store the results as a baseline file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before flagging, 0.2 = 20%%")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any benchmark regressed")
+    args = parser.parse_args(argv)
+
+    workdir = _isolate()
+    results = {}
+    if args.only in (None, "service"):
+        results.update(service_benchmarks(args.quick))
+    if args.only in (None, "startup"):
+        results.update(startup_benchmarks(3 if args.quick else 5))
+    if args.only in (None, "http"):
+        concurrency = [int(c) for c in args.concurrency.split(",") if c]
+        results.update(asyncio.run(http_benchmarks(concurrency, args.requests, args.repos)))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workdir": workdir,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(report, json.load(f), args.threshold)
+        _print_comparison(rows, args.threshold)
+        if args.fail_on_regression and any(row[4] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,9 @@
 import uvicorn
+from app.database import engine
+from app.migrations import run_migrations
 
 if __name__ == "__main__":
+    # Once here rather than at app import, so reloads skip the schema work
+    run_migrations(engine)
+    engine.dispose()
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
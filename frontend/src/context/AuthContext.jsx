@@ -72,6 +72,12 @@ export const AuthProvider = ({ children }) => {
     };
 
     const logout = () => {
+        // Revoke server-side too; the local session ends either way. The header is
+        // set here because the interceptor runs after the token is removed below.
+        const token = localStorage.getItem('token');
+        if (token) {
+            api.post('/auth/logout', null, { headers: { Authorization: `Bearer ${token}` } }).catch(() => {});
+        }
         localStorage.removeItem('token');
         setUser(null);
         setIsAuthenticated(false);
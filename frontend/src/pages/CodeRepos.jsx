@@ -34,8 +34,15 @@ const CodeRepos = () => {
 
     const fetchRepos = async () => {
         try {
-            const res = await api.get('/code/');
-            setRepos(res.data);
+            // The listing is paginated: follow X-Next-Cursor until the last page
+            const all = [];
+            let cursor;
+            do {
+                const res = await api.get('/code/', { params: { limit: 1000, cursor } });
+                all.push(...res.data);
+                cursor = res.headers['x-next-cursor'];
+            } while (cursor);
+            setRepos(all);
         } catch (e) {
             console.error(e);
         }